@@ -3,44 +3,766 @@
 # copyMerge will be deprecated in Hadoop 3.0
 # This can be used in a pySpark application (assumes `sc` variable exists)
 
-def copyMerge (src_dir, dst_file, overwrite=False, deleteSource=False, debug=False):
-    
-    # this function has been migrated to https://github.com/Tagar/abalon Python package
-    
-    hadoop = sc._jvm.org.apache.hadoop
-    conf = hadoop.conf.Configuration()
-    fs = hadoop.fs.FileSystem.get(conf)
+import os
+import json
+import time
+import zlib
+import errno
+import math
+import shutil
+import threading
+from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
 
-    # check files that will be merged
-    files = []
-    for f in fs.listStatus(hadoop.fs.Path(src_dir)):
-        if f.isFile():
-            files.append(f.getPath())
-    if not files:
-        raise ValueError("Source directory {} is empty".format(src_dir))
-    files.sort(key=lambda f: str(f))
+
+class HadoopFileSystem:
+    """ Hadoop FileSystem API through py4j gateway of a SparkContext """
+
+    def __init__(self, sc):
+        self.hadoop = sc._jvm.org.apache.hadoop
+        self.commons_io = sc._jvm.org.apache.commons.io
+        self.conf = self.hadoop.conf.Configuration()
+        self.fs = self.hadoop.fs.FileSystem.get(self.conf)
+
+    def list_files(self, src_dir):
+        """ (path, size) of files (not subdirectories) in src_dir, in alphabetical order """
+        files = [(f.getPath(), f.getLen()) for f in self.fs.listStatus(self.hadoop.fs.Path(src_dir)) if f.isFile()]
+        files.sort(key=lambda f: str(f[0]))
+        return files
+
+    def create(self, path, overwrite=False):
+        return self.fs.create(self.hadoop.fs.Path(str(path)), overwrite)
+
+    def mkdirs(self, path):
+        self.fs.mkdirs(self.hadoop.fs.Path(str(path)))
+
+    def exists(self, path):
+        return self.fs.exists(self.hadoop.fs.Path(str(path)))
+
+    def size(self, path):
+        return self.fs.getFileStatus(self.hadoop.fs.Path(str(path))).getLen()
+
+    def truncate(self, path, length):
+        path = self.hadoop.fs.Path(str(path))
+        if not self.fs.truncate(path, length):
+            # HDFS recovers the new last block in background, file can't be appended to until it's closed
+            while not self.fs.isFileClosed(path):
+                time.sleep(1)
+
+    def append(self, path):
+        return self.fs.append(self.hadoop.fs.Path(str(path)))
+
+    def sync(self, out_stream):
+        out_stream.hsync()
+
+    def read_text(self, path):
+        """ Content of a file written by write_text(), None if there is none """
+        for name in (str(path), str(path) + '._tmp'):     # write_text() could be interrupted between delete and rename
+            if self.exists(name):
+                in_stream = self.fs.open(self.hadoop.fs.Path(name))
+                try:
+                    return bytes(self.commons_io.IOUtils.toByteArray(in_stream)).decode()
+                finally:
+                    in_stream.close()
+        return None
+
+    def write_text(self, path, text):
+        """ Replaces a small file - HDFS rename doesn't overwrite, so it's delete and rename of a temp file """
+        tmp = self.hadoop.fs.Path(str(path) + '._tmp')
+        out_stream = self.fs.create(tmp, True)
+        try:
+            out_stream.write(bytearray(text.encode()))
+        finally:
+            out_stream.close()
+        self.fs.delete(self.hadoop.fs.Path(str(path)), False)
+        self.fs.rename(tmp, self.hadoop.fs.Path(str(path)))
+
+    def copy(self, path, out_stream, start=0):
+        """ Appends file from `start` to out_stream; returns the number of bytes copied """
+        in_stream = self.fs.open(self.hadoop.fs.Path(str(path)))   # InputStream object
+        try:
+            in_stream.seek(start)
+            self.hadoop.io.IOUtils.copyBytes(in_stream, out_stream, self.conf, False)     # False means don't close out_stream
+            return in_stream.getPos() - start
+        finally:
+            in_stream.close()
+
+    def read_blocks(self, path, size, block_size, start=0):
+        """ Yields `size` bytes from `start` of the file as bytes blocks; bytes cross py4j gateway as byte[] """
+        in_stream = self.fs.open(self.hadoop.fs.Path(str(path)))
+        try:
+            in_stream.seek(start)
+            remaining = size
+            while remaining > 0:
+                block = bytes(self.commons_io.IOUtils.toByteArray(in_stream, min(block_size, remaining)))
+                remaining -= len(block)
+                yield block
+        finally:
+            in_stream.close()
+
+    def write(self, out_stream, block):
+        out_stream.write(bytearray(block))
+
+    def delete(self, path, recursive=True):
+        self.fs.delete(self.hadoop.fs.Path(str(path)), recursive)
+
+
+class LocalFileSystem:
+    """
+    Local (or FUSE-mounted) filesystem with the same interface as HadoopFileSystem.
+
+    copy() moves bytes between file descriptors in the kernel with os.copy_file_range() or os.sendfile(),
+    so they never pass through Python buffers; where neither is supported (other OS, or filesystems
+    that don't implement them) it falls back to copying with a large buffer.
+    """
+
+    copy_buffer_size = 8 << 20
+    unsupported_errors = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+                          errno.EBADF, errno.ETXTBSY}
+
+    def __init__(self, zero_copy=True):
+        self.copy_file_range = zero_copy and hasattr(os, 'copy_file_range')
+        self.sendfile = zero_copy and hasattr(os, 'sendfile')
+
+    def list_files(self, src_dir):
+        files = [(entry.path, entry.stat().st_size) for entry in os.scandir(src_dir) if entry.is_file()]
+        files.sort(key=lambda f: str(f[0]))
+        return files
+
+    def create(self, path, overwrite=False):
+        # unbuffered - copy() writes to the file descriptor directly
+        return open(path, 'wb' if overwrite else 'xb', buffering=0)
+
+    def mkdirs(self, path):
+        os.makedirs(path, exist_ok=True)
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def size(self, path):
+        return os.path.getsize(path)
+
+    def truncate(self, path, length):
+        os.truncate(path, length)
+
+    def append(self, path):
+        # not O_APPEND - copy_file_range() doesn't write to those
+        out_stream = open(path, 'r+b', buffering=0)
+        out_stream.seek(0, os.SEEK_END)
+        return out_stream
+
+    def sync(self, out_stream):
+        os.fsync(out_stream.fileno())
+
+    def read_text(self, path):
+        try:
+            with open(path) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write_text(self, path, text):
+        with open(path + '._tmp', 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '._tmp', path)
+
+    def copy(self, path, out_stream, start=0):
+        """
+        Appends file from `start` to out_stream; returns the number of bytes copied.
+        Every method continues from the file offsets the previous one left.
+        """
+
+        with open(path, 'rb', buffering=0) as in_stream:
+            in_stream.seek(start)
+            (src, dst) = (in_stream.fileno(), out_stream.fileno())
+            copied = 0
+
+            if self.copy_file_range:
+                (n, done) = self._copy_loop(lambda: os.copy_file_range(src, dst, 1 << 30))
+                copied += n
+                if done:
+                    return copied
+            if self.sendfile:
+                (n, done) = self._copy_loop(lambda: os.sendfile(dst, src, None, 1 << 30))
+                copied += n
+                if done:
+                    return copied
+
+            buffer = bytearray(self.copy_buffer_size)
+            while True:
+                n = in_stream.readinto(buffer)
+                if not n:
+                    return copied
+                self.write(out_stream, memoryview(buffer)[:n])
+                copied += n
+
+    def _copy_loop(self, copy_chunk):
+        """
+        Runs copy_chunk() until end of file; returns (bytes copied, True if it got to the end).
+        Not done if it isn't supported for these files, or if the first call copies nothing -
+        some kernels and filesystems return 0 instead of failing, so the next method has to make sure.
+        """
+        copied = 0
+        while True:
+            try:
+                n = copy_chunk()
+            except OSError as e:
+                if e.errno in self.unsupported_errors:
+                    return copied, False
+                raise
+            if not n:
+                return copied, copied > 0
+            copied += n
+
+    def read_blocks(self, path, size, block_size, start=0):
+        with open(path, 'rb', buffering=0) as in_stream:
+            in_stream.seek(start)
+            remaining = size
+            while remaining > 0:
+                block = in_stream.read(min(block_size, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                yield block
+
+    def write(self, out_stream, block):
+        block = memoryview(block)
+        while block:
+            block = block[out_stream.write(block):]
+
+    def delete(self, path, recursive=True):
+        if recursive and os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+
+class _FormattedParts:
+    """
+    Wraps a filesystem, so source files listed by list_files() are merged as parts of one file in `merge_format`:
+
+    text - each part ends with a newline
+    csv  - same, and first line of a part is dropped when it repeats the header of the first part
+    gzip - parts are concatenated as gzip members (checked by magic bytes), without decompressing
+
+    Only the first block (csv, gzip) and the last byte (text, csv) of a part are read while listing,
+    sizes returned by list_files() are sizes of the parts as they will be merged.
+    """
+
+    merge_formats = ('text', 'csv', 'gzip')
+
+    def __init__(self, fs, merge_format, block_size=4 << 20, parallelism=16):
+        if merge_format not in self.merge_formats:
+            raise ValueError("merge_format should be one of {}".format(', '.join(self.merge_formats)))
+        self.fs = fs
+        self.merge_format = merge_format
+        self.block_size = block_size
+        self.parallelism = parallelism
+        self.header = None
+        self.parts = {}     # str(path) -> [size, start, append newline]
+
+    def __getattr__(self, name):
+        return getattr(self.fs, name)
+
+    def list_files(self, src_dir):
+        files = self.fs.list_files(src_dir)
+        non_empty = [(path, size) for path, size in files if size]
+
+        if self.merge_format == 'csv' and non_empty:
+            first_block = self._first_block(*non_empty[0])
+            self.header = first_block[:first_block.find(b'\n') + 1] or first_block
+            self.parts[str(non_empty[0][0])] = self._inspect(*non_empty[0], keep_header=True)
+            non_empty = non_empty[1:]
+
+        with ThreadPoolExecutor(self.parallelism, thread_name_prefix='copyMerge') as executor:
+            for (path, size), part in zip(non_empty, executor.map(lambda f: self._inspect(*f), non_empty)):
+                self.parts[str(path)] = part
+
+        return [(path, self.merged_size(path, size)) for path, size in files]
+
+    def keep_header(self, path):
+        """ Part starts a new output file (e.g. a shard) - it keeps its header """
+        part = self.parts.get(str(path))
+        if part:
+            part[1] = 0
+
+    def merged_size(self, path, size):
+        part = self.parts.get(str(path))
+        return part[0] - part[1] + part[2] if part else size
+
+    def _first_block(self, path, size):
+        return next(self.fs.read_blocks(path, min(size, self.block_size), self.block_size), b'')
+
+    def _inspect(self, path, size, keep_header=False):
+        if self.merge_format == 'gzip':
+            if self._first_block(path, min(size, 2)) != b'\x1f\x8b':
+                raise ValueError("{} is not gzip-compressed".format(path))
+            return [size, 0, False]
+
+        start = 0
+        if self.merge_format == 'csv':
+            first_block = self._first_block(path, size)
+            line_end = first_block.find(b'\n') + 1 or (size if size <= len(first_block) else 0)
+            if not keep_header and line_end and \
+                    first_block[:line_end].rstrip(b'\r\n') == self.header.rstrip(b'\r\n'):
+                start = line_end
+            if size <= len(first_block):
+                return [size, start, start < size and not first_block.endswith(b'\n')]
+
+        last_byte = next(self.fs.read_blocks(path, 1, 1, size - 1), b'')
+        return [size, start, start < size and last_byte != b'\n']
+
+    def copy(self, path, out_stream):
+        part = self.parts.get(str(path))
+        if part is None:
+            return self.fs.copy(path, out_stream)    # e.g. intermediates of a tree merge
+        (size, start, newline) = part
+        copied = self.fs.copy(path, out_stream, start) if start < size else 0
+        if newline:
+            self.fs.write(out_stream, b'\n')
+            copied += 1
+        return copied
+
+    def read_blocks(self, path, size, block_size, start=0):
+        part = self.parts.get(str(path))
+        if part is None or start:
+            yield from self.fs.read_blocks(path, size, block_size, start)
+            return
+        yield from self.fs.read_blocks(path, part[0] - part[1], block_size, part[1])
+        if part[2]:
+            yield b'\n'
+
+
+class _BufferPool:
+    """
+    Memory budget for blocks read ahead of the writer.
+    Reader of the file that is being written (`head`) may use the whole budget,
+    readers of files further ahead leave one block for it - so the writer can always progress.
+    """
+
+    def __init__(self, max_bytes, block_size):
+        self.max_bytes = max(max_bytes, 2 * block_size)
+        self.block_size = block_size
+        self.used = 0
+        self.head = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def acquire(self, nbytes, index):
+        with self.condition:
+            self.condition.wait_for(lambda: self.closed or self.used + nbytes <= self.max_bytes - (
+                                        0 if index == self.head else self.block_size))
+            if self.closed:
+                raise RuntimeError("copyMerge aborted")
+            self.used += nbytes
+
+    def release(self, nbytes):
+        with self.condition:
+            self.used -= nbytes
+            self.condition.notify_all()
+
+    def advance(self, index):
+        with self.condition:
+            self.head = index
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+def _check_copied(path, copied, size):
+    """ A file that changed while listed, or a copy that stopped short, must not pass as merged """
+    if copied != size:
+        raise IOError("Copied {} bytes of {}, but it was listed with {} bytes".format(copied, path, size))
+
+
+def _prefetch(fs, path, size, index, buffers, queue):
+    """ Reads one source file into queue as blocks; None marks its end, an exception is passed to the writer """
+    try:
+        for block in fs.read_blocks(path, size, buffers.block_size):
+            buffers.acquire(len(block), index)
+            queue.put(block)
+        queue.put(None)
+    except BaseException as e:
+        queue.put(e)
+
+
+def _pipelined_copy(fs, files, out_stream, dst_file, parallelism, max_buffer_bytes, block_size, debug,
+                    file_done=None, checksums=False, counter=None):
+    """
+    Reads up to `parallelism` source files ahead concurrently, while blocks are appended
+    to out_stream strictly in the order of `files`.
+    file_done(index, crc32 or None) is called after each file is written.
+    counter - progress counter of the writer thread, bytes are counted per block and items per file
+    """
+
+    buffers = _BufferPool(max_buffer_bytes, block_size)
+    queues = [Queue() for _ in files]
+
+    with ThreadPoolExecutor(parallelism, thread_name_prefix='copyMerge') as executor:
+        try:
+            # executor starts readers in submission order, so the file being written is always being read
+            for index, (path, size) in enumerate(files):
+                executor.submit(_prefetch, fs, path, size, index, buffers, queues[index])
+
+            for index, (path, size) in enumerate(files):
+                if debug:
+                    print("Appending file {} into {}".format(path, dst_file))
+                buffers.advance(index)
+                (crc, written) = (0, 0)
+                while True:
+                    block = queues[index].get()
+                    if block is None:
+                        break
+                    if isinstance(block, BaseException):
+                        raise block
+                    fs.write(out_stream, block)
+                    written += len(block)
+                    if checksums:
+                        crc = zlib.crc32(block, crc)
+                    if counter is not None:
+                        counter.bytes += len(block)
+                    buffers.release(len(block))
+                _check_copied(path, written, size)
+                if counter is not None:
+                    counter.items += 1
+                if file_done:
+                    file_done(index, crc if checksums else None)
+        finally:
+            buffers.close()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _merge_files(fs, files, dst_file, overwrite, debug, parallelism=1, max_buffer_bytes=256 << 20, block_size=4 << 20,
+                 progress=None):
+    """ Appends (path, size) files, in the given order, into a new dst_file """
 
     # dst_permission = hadoop.fs.permission.FsPermission.valueOf(permission)      # , permission='-rw-r-----'
-    out_stream = fs.create(hadoop.fs.Path(dst_file), overwrite)
+    out_stream = fs.create(dst_file, overwrite)
+    counter = progress.counter() if progress is not None else None     # this thread's own, bumped without a lock
 
     try:
-        # loop over files in alphabetical order and append them one by one to the target file
-        for file in files:
-            if debug: 
-                print("Appending file {} into {}".format(file, dst_file))
+        if parallelism > 1:
+            _pipelined_copy(fs, files, out_stream, dst_file, parallelism, max_buffer_bytes, block_size, debug,
+                            counter=counter)
+        else:
+            # loop over files in alphabetical order and append them one by one to the target file
+            for file, size in files:
+                if debug:
+                    print("Appending file {} into {}".format(file, dst_file))
 
-            in_stream = fs.open(file)   # InputStream object
-            try:
-                hadoop.io.IOUtils.copyBytes(in_stream, out_stream, conf, False)     # False means don't close out_stream
-            finally:
-                in_stream.close()
+                _check_copied(file, fs.copy(file, out_stream), size)
+                if counter is not None:
+                    counter.items += 1
+                    counter.bytes += size
+    finally:
+        out_stream.close()
+
+
+def _balanced_groups(files, n):
+    """
+    Splits sorted (path, size) files into at most n contiguous groups of about equal total size,
+    so concatenating the groups in order gives back the original order
+    """
+
+    total = sum(size for path, size in files)
+    groups = [[] for _ in range(n)]
+    offset = 0
+    for index, (path, size) in enumerate(files):
+        # a file goes to the group its midpoint falls into; empty input is split by file count
+        position = (offset + size / 2) / total if total else (index + 0.5) / len(files)
+        groups[min(n - 1, int(position * n))].append((path, size))
+        offset += size
+    return [group for group in groups if group]
+
+
+def _tree_levels(count, fanout):
+    """ Number of intermediate levels _tree_merge makes of `count` files """
+    levels = 0
+    while count > fanout:
+        count = math.ceil(count / fanout)
+        levels += 1
+    return levels
+
+
+def _tree_merge(fs, files, tmp_dir, fanout, parallelism, debug, progress=None):
+    """
+    Concatenates groups of about `fanout` files concurrently into intermediate files,
+    level by level, until at most `fanout` are left for the final assembly; returns those
+    """
+
+    level = 0
+    while len(files) > fanout:
+        groups = _balanced_groups(files, math.ceil(len(files) / fanout))
+        level_dir = '{}/level-{}'.format(tmp_dir, level)
+        fs.mkdirs(level_dir)
+
+        intermediates = ['{}/part-{:05d}'.format(level_dir, i) for i in range(len(groups))]
+        with ThreadPoolExecutor(parallelism, thread_name_prefix='copyMerge') as executor:
+            for result in [executor.submit(_merge_files, fs, group, path, True, debug, progress=progress)
+                           for group, path in zip(groups, intermediates)]:
+                result.result()
+
+        if level > 0:
+            fs.delete('{}/level-{}'.format(tmp_dir, level - 1), True)
+        files = [(path, sum(size for _, size in group)) for group, path in zip(groups, intermediates)]
+        level += 1
+
+    return files
+
+
+def _committed_files(fs, files, src_dir, dst_file, manifest, checksums, block_size, debug):
+    """
+    Files of the manifest that are merged into dst_file, as [path, size, crc32 or None];
+    with checksums, stops at the first file whose bytes in dst_file don't match
+    """
+
+    committed = manifest['files']
+    if manifest['src_dir'] != str(src_dir) or \
+            [(str(path), size) for path, size in files[:len(committed)]] != [(path, size) for path, size, crc in committed]:
+        raise ValueError("Source files of {} changed since the interrupted merge, "
+                         "rerun it with overwrite=True and resume=False".format(src_dir))
+    if fs.size(dst_file) < manifest['offset']:
+        raise ValueError("{} is shorter than its manifest's committed offset".format(dst_file))
+
+    if checksums:
+        offset = 0
+        for index, (path, size, crc) in enumerate(committed):
+            if crc is not None:
+                actual = 0
+                for block in fs.read_blocks(dst_file, size, block_size, offset):
+                    actual = zlib.crc32(block, actual)
+                if actual != crc:
+                    if debug:
+                        print("Checksum of {} in {} doesn't match, merging again from it".format(path, dst_file))
+                    return committed[:index]
+            offset += size
+
+    return committed
+
+
+def _resumable_merge(fs, files, src_dir, dst_file, manifest_file, manifest_text, overwrite, debug,
+                     parallelism, max_buffer_bytes, block_size, checksums, checkpoint_bytes, progress=None):
+    """
+    Merge that commits progress to manifest_file every checkpoint_bytes (at a file boundary);
+    with manifest_text of an interrupted merge, dst_file is truncated to the committed offset and merge continues from the next file
+    """
+
+    if manifest_text is not None:
+        committed = _committed_files(fs, files, src_dir, dst_file, json.loads(manifest_text), checksums,
+                                     block_size, debug)
+        offset = sum(size for path, size, crc in committed)
+        if debug:
+            print("Resuming merge into {} after {} files ({} bytes)".format(dst_file, len(committed), offset))
+        fs.truncate(dst_file, offset)
+        out_stream = fs.append(dst_file)
+    else:
+        (committed, offset) = ([], 0)
+        out_stream = fs.create(dst_file, overwrite)
+
+    def commit():
+        fs.sync(out_stream)
+        fs.write_text(manifest_file, json.dumps({'src_dir': str(src_dir), 'offset': offset, 'files': committed}))
+
+    remaining = files[len(committed):]
+    pending = 0
+    counter = progress.counter() if progress is not None else None
+    if counter is not None:
+        (counter.items, counter.bytes) = (len(committed), offset)      # merged before the interruption
+
+    def file_done(index, crc):
+        nonlocal offset, pending
+        (path, size) = remaining[index]
+        committed.append([str(path), size, crc])
+        offset += size
+        pending += size
+        if counter is not None:
+            counter.items += 1
+            counter.bytes += size
+        if pending >= checkpoint_bytes:
+            commit()
+            pending = 0
+
+    try:
+        commit()    # a rerun finds the manifest even if this one fails before the first checkpoint
+
+        if parallelism > 1:
+            _pipelined_copy(fs, remaining, out_stream, dst_file, parallelism, max_buffer_bytes, block_size, debug,
+                            file_done, checksums)
+        else:
+            for index, (path, size) in enumerate(remaining):
+                if debug:
+                    print("Appending file {} into {}".format(path, dst_file))
+                crc = None
+                if checksums:
+                    (crc, written) = (0, 0)
+                    for block in fs.read_blocks(path, size, block_size):
+                        fs.write(out_stream, block)
+                        crc = zlib.crc32(block, crc)
+                        written += len(block)
+                    _check_copied(path, written, size)
+                else:
+                    _check_copied(path, fs.copy(path, out_stream), size)
+                file_done(index, crc)
     finally:
         out_stream.close()
 
+    fs.delete(manifest_file, False)
+
+
+def copyMerge (src_dir, dst_file, overwrite=False, deleteSource=False, debug=False,
+               fs=None, parallelism=1, max_buffer_mb=256, block_size_mb=4, tree_fanout=None,
+               resume=False, checksums=False, checkpoint_mb=256, merge_format=None, progress=None):
+    """
+    Merges all files of src_dir (in alphabetical order) into dst_file.
+
+    fs           - HadoopFileSystem (default, through `sc`) or LocalFileSystem
+    parallelism  - with more than 1, source files are read ahead by that many threads
+                   while the writer appends them in order (hides per-file open latency)
+    max_buffer_mb, block_size_mb - memory limit for blocks read ahead, and size of those blocks
+    tree_fanout  - hierarchical merge: groups of about that many files are first concatenated
+                   by `parallelism` threads into intermediates next to dst_file, then those are assembled
+    resume       - keeps progress in <dst_file>.copyMerge.manifest (completed files, sizes, output offset),
+                   committed every checkpoint_mb; a rerun after a failure continues from the last commit
+    checksums    - with resume, crc32 of each file is kept in the manifest and merged bytes are verified on rerun
+                   (files are then copied through Python buffers)
+    merge_format - 'text': parts end with a newline; 'csv': also only the first header is kept;
+                   'gzip': parts are checked to be gzip members. Raw concatenation by default.
+    progress     - a spinner.Progress (anything with counter() and total_bytes); copied files and bytes
+                   are counted in it, including copies into tree_fanout intermediates
+    """
+
+    # this function has been migrated to https://github.com/Tagar/abalon Python package
+
+    if fs is None:
+        fs = HadoopFileSystem(sc)
+    if merge_format:
+        fs = _FormattedParts(fs, merge_format, int(block_size_mb * (1 << 20)))
+
+    # check files that will be merged
+    files = fs.list_files(src_dir)
+    if not files:
+        raise ValueError("Source directory {} is empty".format(src_dir))
+
+    manifest_file = str(dst_file) + '.copyMerge.manifest'
+    if resume and tree_fanout:
+        raise ValueError("resume and tree_fanout can't be used together")
+
+    manifest_text = fs.read_text(manifest_file) if resume else None
+
+    if not overwrite and manifest_text is None and fs.exists(dst_file):
+        raise FileExistsError("Target file {} already exists".format(dst_file))
+
+    if progress is not None:
+        levels = _tree_levels(len(files), max(tree_fanout, 2)) if tree_fanout else 0
+        progress.total_bytes = sum(size for path, size in files) * (levels + 1)
+
+    if resume:
+        _resumable_merge(fs, files, src_dir, dst_file, manifest_file, manifest_text, overwrite, debug, parallelism,
+                         int(max_buffer_mb * (1 << 20)), int(block_size_mb * (1 << 20)),
+                         checksums, int(checkpoint_mb * (1 << 20)), progress)
+    else:
+        tmp_dir = str(dst_file) + '._copyMerge_tmp'
+        try:
+            if tree_fanout:
+                files = _tree_merge(fs, files, tmp_dir, max(tree_fanout, 2), parallelism, debug, progress)
+
+            _merge_files(fs, files, dst_file, overwrite, debug, parallelism,
+                         int(max_buffer_mb * (1 << 20)), int(block_size_mb * (1 << 20)), progress)
+        finally:
+            if tree_fanout and fs.exists(tmp_dir):
+                fs.delete(tmp_dir, True)
+
+    if deleteSource:
+        fs.delete(src_dir, True)    # True=recursive
+        if debug:
+            print("Source directory {} removed.".format(src_dir))
+
+
+def copyMergeShards (src_dir, dst_dir, overwrite=False, deleteSource=False, debug=False,
+                     fs=None, shard_size_mb=1024, num_shards=None, parallelism=8, merge_format=None, progress=None):
+    """
+    Merges all files of src_dir into dst_dir/part-00000, part-00001, ... of about shard_size_mb each
+    (or exactly num_shards of them), balanced by source file sizes; `parallelism` shards are written at once.
+    Shards keep the alphabetical order - reading them in name order gives the same bytes as copyMerge
+    (with merge_format='csv' every shard has the header). `progress` - as in copyMerge.
+    Returns list of shard paths.
+    """
+
+    if fs is None:
+        fs = HadoopFileSystem(sc)
+    if merge_format:
+        fs = _FormattedParts(fs, merge_format)
+
+    files = fs.list_files(src_dir)
+    if not files:
+        raise ValueError("Source directory {} is empty".format(src_dir))
+
+    if fs.exists(dst_dir):
+        if not overwrite:
+            raise FileExistsError("Target directory {} already exists".format(dst_dir))
+        fs.delete(dst_dir, True)    # shards of a previous run could outnumber this one's
+    fs.mkdirs(dst_dir)
+
+    if not num_shards:
+        total = sum(size for path, size in files)
+        num_shards = max(1, math.ceil(total / (shard_size_mb * (1 << 20))))
+    groups = _balanced_groups(files, num_shards)
+    if merge_format:
+        for group in groups[1:]:
+            fs.keep_header(group[0][0])
+    shards = ['{}/part-{:05d}'.format(dst_dir, i) for i in range(len(groups))]
+    if progress is not None:
+        progress.total_bytes = sum(size for path, size in files)
+
+    with ThreadPoolExecutor(parallelism, thread_name_prefix='copyMerge') as executor:
+        for result in [executor.submit(_merge_files, fs, group, shard, False, debug, progress=progress)
+                       for group, shard in zip(groups, shards)]:
+            result.result()
+
     if deleteSource:
-        fs.delete(hadoop.fs.Path(src_dir), True)    # True=recursive
+        fs.delete(src_dir, True)
         if debug:
             print("Source directory {} removed.".format(src_dir))
 
-copyMerge('/user/rdautkha/testdir', '/user/rdautkha/test_merge.txt', debug=True, overwrite=True, deleteSource=True)
+    return shards
+
+
+def copyMergeLocal (src_dir, dst_file, overwrite=False, deleteSource=False, debug=False):
+    """ copyMerge for local or FUSE-mounted (e.g. /hdfs_mount) paths - doesn't need a SparkContext """
+    copyMerge(src_dir, dst_file, overwrite, deleteSource, debug, fs=LocalFileSystem())
+
 
+### usage example (pySpark):
+#
+# copyMerge('/user/rdautkha/testdir', '/user/rdautkha/test_merge.txt', debug=True, overwrite=True, deleteSource=True)
+#
+# or with 16 files read ahead concurrently, using up to 512MB of memory:
+#
+# copyMerge('/user/rdautkha/testdir', '/user/rdautkha/test_merge.txt', parallelism=16, max_buffer_mb=512)
+#
+# local / FUSE-mounted directories don't need a SparkContext:
+#
+# copyMergeLocal('/hdfs_mount/user/rdautkha/testdir', '/tmp/test_merge.txt')
+#
+# hierarchical merge - groups of 100 parts concatenated by 16 threads before the final assembly:
+#
+# copyMerge('/user/rdautkha/testdir', '/user/rdautkha/test_merge.txt', parallelism=16, tree_fanout=100)
+#
+# or 1GB shards test_merge/part-00000, part-00001, ... written by 8 threads:
+#
+# copyMergeShards('/user/rdautkha/testdir', '/user/rdautkha/test_merge', shard_size_mb=1024)
+#
+# CSV parts with headers (only the first one is kept), or gzip-compressed parts:
+#
+# copyMerge('/user/rdautkha/testdir', '/user/rdautkha/test_merge.csv', merge_format='csv')
+# copyMerge('/user/rdautkha/testdir', '/user/rdautkha/test_merge.csv.gz', merge_format='gzip')
+#
+# with MB/s, percent done and ETA shown while merging (spinner.py of this repo):
+#
+# with Progress('Merging', unit='files') as progress:
+#     copyMerge('/user/rdautkha/testdir', '/user/rdautkha/test_merge.txt', parallelism=16, progress=progress)
@@ -1,8 +1,257 @@
 #!python
 
 import sys
+import os
 import re
-from time import mktime, strptime, strftime
+import io
+import csv
+import json
+import glob
+import time
+import hashlib
+import mmap
+import gzip
+import bz2
+import lzma
+import threading
+from array import array
+from itertools import repeat
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from time import mktime, strptime, strftime, struct_time, localtime, monotonic
+
+
+class Log4jTimeDecoder:
+    """
+    Decodes fixed-width log4j `%y/%m/%d %H:%M:%S` timestamps.
+
+    strptime() is only called once per distinct `%y/%m/%d %H:%M` prefix;
+    seconds are sliced by position and added to the cached minute.
+    Returns the same values as DbuParser.parse_time() / DbuParser.parse_ts().
+    """
+
+    minute_format = "%y/%m/%d %H:%M"
+
+    def __init__(self):
+        self.minute_key = None
+        self.minute_time = None     # struct_time of the cached minute (tm_sec == 0)
+        self.minute_ts = 0          # epoch of the cached minute
+
+    def load_minute(self, key: str):
+        self.minute_time = strptime(key, self.minute_format)
+        self.minute_ts = mktime(self.minute_time)
+        self.minute_key = key
+
+    @staticmethod
+    def fixed_width(timestr: str):
+        return len(timestr) == 17 and timestr[14] == ':' and timestr[15:17].isdigit() and timestr[15:17] <= '61'
+
+    def parse_time(self, timestr: str):
+        if not self.fixed_width(timestr):
+            return strptime(timestr, DbuParser.log4j_time_format)
+        if timestr[0:14] != self.minute_key:
+            self.load_minute(timestr[0:14])
+        tm = self.minute_time
+        return struct_time((tm[0], tm[1], tm[2], tm[3], tm[4], int(timestr[15:17]), tm[6], tm[7], tm[8]))
+
+    def parse_ts(self, timestr: str):
+        if not self.fixed_width(timestr):
+            return mktime(strptime(timestr, DbuParser.log4j_time_format))
+        if timestr[0:14] != self.minute_key:
+            self.load_minute(timestr[0:14])
+        return self.minute_ts + int(timestr[15:17])
+
+
+class ExecutorTimeline:
+    """
+    Compact event stream of a job: timestamps (float64) and changes of the number of executors (int16).
+    The first event is the job start (delta 0) and the last one is the job end (delta resets to 0 executors).
+
+    Events are collected into stdlib arrays while parsing; analysis is vectorized with NumPy,
+    so timelines can be saved to .npy/.npz and re-analyzed without parsing the log again.
+    """
+
+    dtype = [("ts", "<f8"), ("delta", "<i2")]       # .npy record layout
+
+    def __init__(self, timestamps=None, deltas=None):
+        self.timestamps = array("d", [] if timestamps is None else timestamps)
+        self.deltas = array("h", [] if deltas is None else deltas)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, when_ts, delta: int):
+        self.timestamps.append(when_ts)
+        self.deltas.append(delta)
+
+    @staticmethod
+    def numpy():
+        """ NumPy is optional and imported only here - it'd be most of the startup time of every run """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("NumPy is required for executor timeline analysis")
+        return numpy
+
+    def arrays(self):
+        """ (timestamps, executors) - number of executors after each event """
+        np = self.numpy()
+        timestamps = np.frombuffer(self.timestamps, dtype=np.float64)
+        executors = np.cumsum(np.frombuffer(self.deltas, dtype=np.int16), dtype=np.int64)
+        return timestamps, executors
+
+    def runtime(self):
+        return self.timestamps[-1] - self.timestamps[0]
+
+    def integral(self):
+        """ total worker-seconds """
+        np = self.numpy()
+        (timestamps, executors) = self.arrays()
+        return float(np.dot(np.diff(timestamps), executors[:-1]))
+
+    def max(self):
+        (timestamps, executors) = self.arrays()
+        return int(executors.max())
+
+    def average(self):
+        runtime = self.runtime()
+        if not runtime:         # a single event, or all at the same second
+            return float(self.arrays()[1][-1])
+        return self.integral() / runtime
+
+    def percentiles(self, q=(50, 90, 99)):
+        """ time-weighted percentiles of the number of executors """
+        np = self.numpy()
+        (timestamps, executors) = self.arrays()
+        durations = np.diff(timestamps)
+        order = np.argsort(executors[:-1], kind="stable")
+        weights = np.cumsum(durations[order])
+        positions = np.searchsorted(weights, np.asarray(q, dtype=np.float64) / 100 * weights[-1])
+        return executors[:-1][order][np.minimum(positions, len(order) - 1)]
+
+    def resample(self, interval: float):
+        """
+        Time-weighted average number of executors over fixed `interval`-second buckets.
+        The last bucket, cut short by the job end, is averaged over its covered seconds (like ExecutorHistogram).
+        Returns (bucket start timestamps, average executors).
+        """
+        np = self.numpy()
+        (timestamps, executors) = self.arrays()
+        # cumulative worker-seconds is linear between events, so interpolation at bucket edges is exact
+        cumulative = np.concatenate(([0.0], np.cumsum(np.diff(timestamps) * executors[:-1])))
+        edges = np.arange(timestamps[0], timestamps[-1] + interval, interval)
+        widths = np.minimum(edges[1:], timestamps[-1]) - edges[:-1]
+        covered = widths > 0
+        occupancy = np.diff(np.interp(edges, timestamps, cumulative))[covered] / widths[covered]
+        return edges[:-1][covered], occupancy
+
+    def save(self, filename: str):
+        """ .npz stores two arrays; any other name is saved as .npy of (ts, delta) records """
+        np = self.numpy()
+        (timestamps, deltas) = (np.frombuffer(self.timestamps, dtype=np.float64),
+                                np.frombuffer(self.deltas, dtype=np.int16))
+        if filename.endswith(".npz"):
+            np.savez_compressed(filename, timestamps=timestamps, deltas=deltas)
+        else:
+            records = np.empty(len(timestamps), dtype=self.dtype)
+            (records["ts"], records["delta"]) = (timestamps, deltas)
+            np.save(filename, records)
+
+    @classmethod
+    def load(cls, filename: str):
+        np = cls.numpy()
+        data = np.load(filename)
+        if filename.endswith(".npz"):
+            with data:
+                (timestamps, deltas) = (data["timestamps"], data["deltas"])
+        else:
+            (timestamps, deltas) = (data["ts"], data["delta"])
+        timeline = cls()
+        timeline.timestamps.frombytes(np.ascontiguousarray(timestamps, dtype=np.float64).tobytes())
+        timeline.deltas.frombytes(np.ascontiguousarray(deltas, dtype=np.int16).tobytes())
+        return timeline
+
+
+class ExecutorHistogram:
+    """
+    Number of executors over fixed-width time buckets (e.g. 10s, 1m, 5m, 1h), built in one pass.
+    Every bucket keeps covered seconds, worker-seconds (for the time-weighted average), min and max.
+    """
+
+    def __init__(self, bucket_seconds: float = 60):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = {}       # bucket number -> [covered seconds, worker-seconds, min, max]
+        self.rendered_day = None    # day header of the last render() - follow mode renders a few rows at a time
+
+    def add_interval(self, t0, t1, executors: int):
+        """ `executors` were active from t0 to t1; zero-length intervals only count towards min/max """
+
+        width = self.bucket_seconds
+        t1 = max(t0, t1)
+        number = int(t0 // width)
+        while True:
+            bucket_end = (number + 1) * width
+            seconds = min(t1, bucket_end) - t0
+            bucket = self.buckets.get(number)
+            if bucket is None:
+                self.buckets[number] = [seconds, seconds * executors, executors, executors]
+            else:
+                bucket[0] += seconds
+                bucket[1] += seconds * executors
+                if bucket[2] > executors:
+                    bucket[2] = executors
+                if bucket[3] < executors:
+                    bucket[3] = executors
+            if t1 <= bucket_end:
+                break
+            t0 = bucket_end
+            number += 1
+
+    def merge(self, other, offset: int = 0):
+        """ Adds buckets of another histogram whose executor counts are relative to `offset` """
+
+        for (number, (seconds, worker_seconds, low, high)) in other.buckets.items():
+            bucket = self.buckets.get(number)
+            if bucket is None:
+                self.buckets[number] = [seconds, worker_seconds + seconds * offset, low + offset, high + offset]
+            else:
+                bucket[0] += seconds
+                bucket[1] += worker_seconds + seconds * offset
+                bucket[2] = min(bucket[2], low + offset)
+                bucket[3] = max(bucket[3], high + offset)
+
+    def rows(self, since=None, until=None):
+        """ (bucket start ts, avg, min, max) for covered buckets, optionally only for [since, until) timestamps """
+
+        first = None if since is None else int(since // self.bucket_seconds)
+        last = None if until is None else int(until // self.bucket_seconds)
+        for number in sorted(self.buckets):
+            if (first is not None and number < first) or (last is not None and number >= last):
+                continue
+            (seconds, worker_seconds, low, high) = self.buckets[number]
+            if seconds:
+                yield (number * self.bucket_seconds, worker_seconds / seconds, low, high)
+
+    def render(self, rows):
+        """
+        Text graph: a `*` per executor on average, `+` up to the max; day changes get a header line,
+        also across calls - rows of a day already rendered don't repeat its header
+        """
+
+        time_format = "%H:%M:%S" if self.bucket_seconds % 60 else "%H:%M"
+        daily = self.bucket_seconds >= 86400
+        if daily:
+            time_format = "%m/%d " + time_format
+        lines = []
+        for (ts, avg, low, high) in rows:
+            tm = localtime(ts)
+            if tm[0:3] != self.rendered_day and not daily:
+                self.rendered_day = tm[0:3]
+                lines.append(f"-- {strftime('%a, %d %b %Y', tm)}")
+            stars = round(avg)
+            lines.append(f"{strftime(time_format, tm)} {'*' * stars}{'+' * (high - stars)} "
+                         f"{avg:.1f} ({low}-{high})")
+        return "".join(line + "\n" for line in lines)
 
 
 class DbuParser:
@@ -10,6 +259,9 @@ class DbuParser:
     log4j_time_format = "%y/%m/%d %H:%M:%S"
     nice_time_format = "%a, %d %b %Y %H:%M:%S"
 
+    state_attributes = ["started_at", "current_executors", "max_executors", "previous_checkpoint_ts",
+                        "integral_seconds"]
+
     @staticmethod
     def parse_time(timestr: str):
         return strptime(timestr, DbuParser.log4j_time_format)
@@ -18,25 +270,51 @@ class DbuParser:
     def parse_ts(timestr: str):
         return mktime(strptime(timestr, DbuParser.log4j_time_format))
 
-    def __init__(self):
+    def __init__(self, verbose: bool = True, collect_timeline: bool = False, graph_bucket: float = None):
+
+        self.verbose = verbose
+        self.timeline = ExecutorTimeline() if collect_timeline else None
+        self.histogram = ExecutorHistogram(graph_bucket) if graph_bucket else None
+        self.graph_printed_until = None
 
-        self.re_parser_time = re.compile(r"^(\S+ \S+) INFO ")
         self.re_parser = re.compile(r"^(\S+ \S+) INFO .+ Executor updated: .+ is now (\S+)")
 
+        self.time_decoder = Log4jTimeDecoder()
+
         self.started_at = 0
 
         self.current_executors = 0
         self.max_executors = 0
 
         self.previous_checkpoint_ts = 0
-        self.previous_line_time = None
 
         self.integral_seconds = 0  # total worker-seconds
         self.stopped_at = self.total_runtime = self.avg_executors = None
 
+    def get_state(self):
+        """ Counters and graph buckets as a JSON-serializable dict - doesn't include the timeline """
+        state = {name: getattr(self, name) for name in self.state_attributes}
+        if self.histogram is not None:
+            state["histogram"] = [[number] + bucket for (number, bucket) in self.histogram.buckets.items()]
+        return state
+
+    def set_state(self, state: dict):
+        for name in self.state_attributes:
+            setattr(self, name, state[name])
+        if self.histogram is not None:
+            self.histogram.buckets = {row[0]: row[1:] for row in state.get("histogram", [])}
+        self.say(f"""Job started at {strftime(self.nice_time_format, localtime(self.started_at))}""")
+
+    def say(self, message: str):
+        if self.verbose:
+            print(message)
+
     def match_process(self, when_ts, what):
 
         self.integral_seconds += (when_ts - self.previous_checkpoint_ts) * self.current_executors
+        if self.histogram is not None:
+            self.histogram.add_interval(self.previous_checkpoint_ts, when_ts, self.current_executors)
+        executors_before = self.current_executors
 
         if what == 'RUNNING':
             self.current_executors += 1
@@ -50,21 +328,36 @@ class DbuParser:
 
         self.previous_checkpoint_ts = when_ts
 
+        if self.timeline is not None and (self.current_executors != executors_before or what == 'END'):
+            self.timeline.append(when_ts, self.current_executors - executors_before)
+
         # print(f"{when_ts}: {self.current_executors} active executors; "
         #       f"accumulated {self.integral_seconds / 60:.01f} executor-minutes")
 
+    def checkpoint(self, when_ts):
+        """ Accounts for executors active up to when_ts, without any change in their number """
+        self.match_process(max(when_ts, self.previous_checkpoint_ts), 'CHECKPOINT')
+
     def first_line(self, line):
-        self.previous_line_time = DbuParser.parse_time(line[0:17])
-        self.started_at = mktime(self.previous_line_time)
-        print(f"""Job started at {strftime(self.nice_time_format, self.previous_line_time)}""")
+        self.start(self.time_decoder.parse_ts(line[0:17]))
+
+    def start(self, started_at):
+        self.started_at = self.previous_checkpoint_ts = started_at
+        if self.timeline is not None:
+            self.timeline.append(self.started_at, 0)
+        self.say(f"""Job started at {strftime(self.nice_time_format, localtime(started_at))}""")
 
-    def print_graph(self, line):
-        if not self.re_parser_time.match(line):
+    def print_graph(self, until_ts=None):
+        """
+        Prints graph buckets that haven't been printed yet, in one write -
+        only buckets completed before until_ts, if specified
+        """
+        if self.histogram is None or not self.verbose:
             return
-        current_time = DbuParser.parse_time(line[0:17])
-        if current_time.tm_min != self.previous_line_time.tm_min:
-            print(f"""{strftime("%H:%M", current_time)} {'*' * self.current_executors}""")
-            self.previous_line_time = current_time
+        rows = list(self.histogram.rows(self.graph_printed_until, until_ts))
+        if rows:
+            sys.stdout.write(self.histogram.render(rows))
+            self.graph_printed_until = rows[-1][0] + self.histogram.bucket_seconds
 
     def try_match(self, line):
         match = self.re_parser.match(line)
@@ -72,54 +365,776 @@ class DbuParser:
             return
 
         (when, what) = match.groups()  # ts, running/lost
-        when_ts = DbuParser.parse_ts(when)
+        when_ts = self.time_decoder.parse_ts(when)
 
         self.match_process(when_ts, what)
 
+    def merge_partials(self, partials):
+        """
+        Applies PartialSummary-s of consecutive byte ranges (in file order) as if
+        their lines were processed here one by one
+        """
+
+        for p in partials:
+            if p.first_event_ts is None:
+                continue
+
+            assert self.current_executors + p.min_executors >= 0, "Number of active executors can't be negative"
+            if p.max_executors is not None and self.max_executors < self.current_executors + p.max_executors:
+                self.max_executors = self.current_executors + p.max_executors
+
+            if self.histogram is not None:
+                self.histogram.add_interval(self.previous_checkpoint_ts, p.first_event_ts, self.current_executors)
+                self.histogram.merge(p.histogram, self.current_executors)
+
+            self.integral_seconds += ((p.first_event_ts - self.previous_checkpoint_ts) * self.current_executors
+                                      + (p.previous_checkpoint_ts - p.first_event_ts) * self.current_executors
+                                      + p.integral_seconds)
+            self.current_executors += p.current_executors
+            self.previous_checkpoint_ts = p.previous_checkpoint_ts
+
+    def running_integral(self, now_ts):
+        """ worker-seconds accumulated so far, including executors that are still running at now_ts """
+        return self.integral_seconds + (now_ts - self.previous_checkpoint_ts) * self.current_executors
+
+    def status(self, line):
+        now_ts = self.time_decoder.parse_ts(line[0:17])
+        self.say(f"{line[9:17]} {self.current_executors} active executors (max {self.max_executors}); "
+                 f"accumulated {self.running_integral(now_ts) / 60:.01f} worker-minutes")
+
     def finalize(self, line):
-        self.stopped_at = DbuParser.parse_ts(line[0:17])
+        self.finish(self.time_decoder.parse_ts(line[0:17]))
+
+    def finish(self, stopped_at):
+        self.stopped_at = stopped_at
         self.total_runtime = int(self.stopped_at - self.started_at)
-        print(f"""Job finished at {strftime(self.nice_time_format, DbuParser.parse_time(line[0:17]))}""")
 
         self.match_process(self.stopped_at, 'END')
+        self.print_graph()
+
+        self.say(f"""Job finished at {strftime(self.nice_time_format, localtime(stopped_at))}""")
 
-        print(f"Script runtime {int(self.total_runtime / 60)}m {self.total_runtime % 60}s,"
-              f" or {self.total_runtime / 60:.01f} driver-minutes")
+        self.say(f"Script runtime {int(self.total_runtime / 60)}m {self.total_runtime % 60}s,"
+                 f" or {self.total_runtime / 60:.01f} driver-minutes")
 
         self.avg_executors = self.integral_seconds / self.total_runtime
-        print(f"Max.executors: {self.max_executors}; Avg.executors: {self.avg_executors:.01f}; "
-              f"total {self.integral_seconds / 60:.01f} worker-minutes")
+        self.say(f"Max.executors: {self.max_executors}; Avg.executors: {self.avg_executors:.01f}; "
+                 f"total {self.integral_seconds / 60:.01f} worker-minutes")
 
 
-def main(filename: str, print_executors_graph: bool = True):
+class PartialSummary(DbuParser):
+    """
+    Executor accounting for one byte range of a log.
 
-    print(f"Processing {filename}")
+    Counts are relative to the (unknown) number of executors at the start of the range,
+    so summaries of consecutive ranges can be combined by DbuParser.merge_partials():
+    current_executors is the net change, min/max_executors are the lowest/highest relative counts,
+    integral_seconds and histogram cover the time between the first and the last event of the range.
+    Only RUNNING and LOST change the count - 'END' is DbuParser's own end-of-log marker
+    and never appears in Spark logs.
+    """
+
+    def __init__(self, graph_bucket: float = None):
+        super().__init__(verbose=False, graph_bucket=graph_bucket)
+        self.line_count = 0
+        self.first_line_prefix = self.last_line_prefix = None     # timestamps (17 chars) of first/last line
+        self.min_executors = 0
+        self.max_executors = None                   # highest relative count reached after a RUNNING event
+        self.first_event_ts = None
+
+    def first_line(self, line):
+        self.first_line_prefix = line[0:17]
+
+    def match_process(self, when_ts, what):
+        if self.first_event_ts is None:
+            self.first_event_ts = when_ts
+        else:
+            self.integral_seconds += (when_ts - self.previous_checkpoint_ts) * self.current_executors
+            if self.histogram is not None:
+                self.histogram.add_interval(self.previous_checkpoint_ts, when_ts, self.current_executors)
+
+        if what == 'RUNNING':
+            self.current_executors += 1
+            if self.max_executors is None or self.max_executors < self.current_executors:
+                self.max_executors = self.current_executors
+        elif what == 'LOST':
+            self.current_executors -= 1
+            if self.min_executors > self.current_executors:
+                self.min_executors = self.current_executors
+
+        self.previous_checkpoint_ts = when_ts
+
+
+def split_ranges(filename: str, parts: int):
+    """ Splits file into up to `parts` byte ranges, each starting at a beginning of a line """
+
+    size = os.path.getsize(filename)
+    bounds = [0]
+    with open(filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, parts):
+            newline = mm.find(b"\n", max(size * i // parts - 1, bounds[-1]))
+            if newline == -1 or newline + 1 >= size:
+                break
+            if newline + 1 > bounds[-1]:
+                bounds.append(newline + 1)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def summarize_range(filename: str, start: int, end: int, graph_bucket: float = None, progress: bool = False):
+    """
+    Process pool worker - builds PartialSummary for [start, end) byte range of the log.
+    With `progress`, counts lines and bytes in the worker's slot of the parent's spinner.Progress.
+    """
+
+    summary = PartialSummary(graph_bucket)
+    counter = None
+    if progress:
+        import spinner
+        counter = spinner.worker_counter
+
+    with open(filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        mm.seek(start)
+        (summary.line_count, line, tail) = scan_log(mm, summary, end - start, progress=counter)
+
+    summary.last_line_prefix = line[0:17]
+    return summary
+
+
+event_marker = b"Executor updated: "      # every line re_parser can match has it
+read_block_size = 4 << 20
+
+compressed_openers = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+
+def open_log(filename: str):
+    """ Opens plain, .gz, .bz2 or .xz log as a binary stream - archived logs are decompressed on the fly """
+
+    opener = compressed_openers.get(os.path.splitext(filename)[1].lower())
+    if opener:
+        return io.BufferedReader(opener(filename, "rb"), buffer_size=read_block_size)
+    return open(filename, "rb", buffering=read_block_size)
+
+
+def scan_log(f, parser, limit: int = None, linecount: int = 0, final: bool = True, progress=None):
+    """
+    Feeds a binary log stream (up to `limit` bytes of it) to the parser, reading it in large blocks.
+    Lines without the event marker are never decoded nor matched with re_parser - they are just counted.
+    `linecount` - lines already processed (when resuming); unless `final`, the last line without
+    a trailing newline isn't processed but returned as the tail.
+    `progress` - a spinner counter, its items and bytes are bumped once per block.
+    Returns (number of lines, last line, tail).
+    """
+
+    line = b""
+    tail = b""
+
+    while True:
+        if limit is None:
+            block = f.read(read_block_size)
+        else:
+            block = f.read(min(read_block_size, limit))
+            limit -= len(block)
+        if block:
+            data = tail + block
+            cut = data.rfind(b"\n") + 1
+            (data, tail) = (data[:cut], data[cut:])
+        elif final:
+            (data, tail) = (tail, b"")      # the last line doesn't end with a newline
+        else:
+            data = b""
+        if not data:
+            if block:
+                continue
+            break
+
+        if not linecount:
+            parser.first_line(data[:data.find(b"\n") + 1 or len(data)].decode(errors="replace"))
+
+        lines = data.count(b"\n")
+        if data[-1:] != b"\n":
+            lines += 1
+        linecount += lines
+        if progress is not None:
+            progress.items += lines
+            progress.bytes += len(data)
+        line = data[data.rfind(b"\n", 0, len(data) - 1) + 1:]
+
+        pos = data.find(event_marker)
+        while pos != -1:
+            start = data.rfind(b"\n", 0, pos) + 1
+            end = data.find(b"\n", pos)
+            if end == -1:
+                end = len(data)
+            parser.try_match(data[start:end].decode(errors="replace"))
+            pos = data.find(event_marker, end)
+
+    return linecount, line.decode(errors="replace"), tail
 
-    linecount = 0
 
-    parser = DbuParser()
+default_cache_dir = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "dbus")
 
-    with open(filename, "r") as f:
-        for line in f:
-            if not linecount:
-                parser.first_line(line)
 
+event_log_markers = (b"SparkListenerExecutor", b"SparkListenerApplication")     # substrings of relevant events
+
+
+def is_event_log(filename: str):
+    """ Spark event logs are JSON lines, log4j logs start with a timestamp """
+    with open_log(filename) as f:
+        return f.peek(64)[:64].lstrip().startswith(b"{")
+
+
+def scan_event_log(f, parser):
+    """
+    Feeds a Spark JSON event log (binary stream) to the parser, reading it in large blocks:
+    SparkListenerExecutorAdded/Removed become RUNNING/LOST, SparkListenerApplicationStart/End
+    start and finish the job (or first/last of those events if the application hasn't finished).
+    Only lines with an event_log_markers substring are passed to json.loads().
+    Returns (number of lines, job end timestamp).
+    """
+
+    linecount = 0
+    tail = b""
+    started = False
+    (last_ts, stopped_at) = (None, None)
+
+    while True:
+        block = f.read(read_block_size)
+        if block:
+            data = tail + block
+            cut = data.rfind(b"\n") + 1
+            (data, tail) = (data[:cut], data[cut:])
+        else:
+            (data, tail) = (tail, b"")
+        if not data:
+            if block:
+                continue
+            break
+
+        linecount += data.count(b"\n")
+        if data[-1:] != b"\n":
             linecount += 1
 
-            if print_executors_graph:
-                # optional graph - number of executors
-                parser.print_graph(line)
+        starts = set()
+        for marker in event_log_markers:
+            pos = data.find(marker)
+            while pos != -1:
+                start = data.rfind(b"\n", 0, pos) + 1
+                starts.add(start)
+                end = data.find(b"\n", pos)
+                pos = -1 if end == -1 else data.find(marker, end)
+
+        for start in sorted(starts):
+            end = data.find(b"\n", start)
+            try:
+                event = json.loads(data[start:] if end == -1 else data[start:end])
+            except ValueError:
+                if end == -1:
+                    continue        # last line of a log that is still being written
+                raise
+            what = event.get("Event")
+            if what not in ("SparkListenerExecutorAdded", "SparkListenerExecutorRemoved",
+                            "SparkListenerApplicationStart", "SparkListenerApplicationEnd"):
+                continue
+
+            when_ts = event["Timestamp"] / 1000
+            last_ts = when_ts if last_ts is None else max(last_ts, when_ts)
+            if not started:
+                parser.start(when_ts)
+                started = True
+
+            if what == "SparkListenerExecutorAdded":
+                parser.match_process(when_ts, 'RUNNING')
+            elif what == "SparkListenerExecutorRemoved":
+                parser.match_process(when_ts, 'LOST')
+            elif what == "SparkListenerApplicationEnd":
+                stopped_at = when_ts
+
+    if not started:
+        raise ValueError("No application or executor events found in the event log")
+    return linecount, stopped_at or last_ts
+
+
+class ResultCache:
+    """
+    Local cache of DbuParser state, keyed by path and inode of the log.
+    An entry records file size and mtime, byte offset of the end of the last complete line processed,
+    line count, last line and bytes just before the offset (to tell an appended file from a rewritten one).
+    Entries are JSON files; old ones are evicted by age and total size of the cache.
+    """
+
+    fingerprint_bytes = 64
+    entry_keys = {"graph_bucket", "size", "mtime", "offset", "fingerprint", "tail", "linecount", "last_line", "state"}
+
+    def __init__(self, cache_dir: str = None, max_age_days: float = 7, max_size_mb: float = 64):
+        self.cache_dir = cache_dir or default_cache_dir
+        self.max_age_days = max_age_days
+        self.max_size_mb = max_size_mb
+
+    def entry_path(self, filename: str, st):
+        key = hashlib.sha1(f"{os.path.realpath(filename)}:{st.st_dev}:{st.st_ino}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def lookup(self, filename: str, st, graph_bucket, state_keys=()):
+        """
+        Returns cache entry this file can be resumed from, or None. A returned entry counts as used now.
+        The cache outlives versions of this script - an entry without some of entry_keys, or whose state
+        lacks some of state_keys, is a miss.
+        """
+
+        path = self.entry_path(filename, st)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            if not self.entry_keys <= entry.keys() or not set(state_keys) <= entry["state"].keys():
+                return None
+            if entry["graph_bucket"] != graph_bucket or st.st_size < entry["size"]:
+                return None
+            if st.st_size == entry["size"] and st.st_mtime != entry["mtime"]:
+                return None         # rewritten in place
+        except (OSError, ValueError, AttributeError, TypeError):
+            return None
+        try:
+            os.utime(path)      # evict() ranks entries by mtime - the time of the last use, not of the last write
+        except OSError:
+            pass
+        return entry
+
+    def store(self, filename: str, st, entry: dict):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.entry_path(filename, st)
+        entry.update(path=os.path.realpath(filename), inode=st.st_ino, size=st.st_size, mtime=st.st_mtime)
+        with open(path + ".tmp", "w") as f:
+            json.dump(entry, f)
+        os.replace(path + ".tmp", path)
+
+    def evict(self):
+        """ Removes entries not used for max_age_days, then least recently used ones above max_size_mb """
+
+        try:
+            names = [name for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        except FileNotFoundError:
+            return
+        entries = []
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort(reverse=True)     # most recently used first
+
+        oldest = time.time() - self.max_age_days * 86400
+        total_size = 0
+        for (mtime, size, path) in entries:
+            total_size += size
+            if mtime < oldest or total_size > self.max_size_mb * (1 << 20):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
 
-            parser.try_match(line)
 
-    print(f"{linecount:,} lines processed.")
+def log_progress(filename: str, processes: int = 0):
+    """ spinner.Progress of reading a log - percent done and ETA are known for uncompressed logs only """
+    from spinner import Progress
+    compressed = os.path.splitext(filename)[1].lower() in compressed_openers
+    return Progress(f"Reading {os.path.basename(filename)}:",
+                    total_bytes=None if compressed else os.path.getsize(filename), processes=processes)
+
+
+def main(filename: str, print_executors_graph: bool = True, verbose: bool = True,
+         collect_timeline: bool = False, graph_bucket: float = 60, cache: ResultCache = None,
+         show_progress: bool = False):
+    """
+    Accepts log4j driver logs and Spark JSON event logs (detected by content, both plain or compressed).
+    With a `cache`, an unchanged log4j log isn't read again, and reading an appended log
+    resumes from where the previous run stopped (not used when collecting a timeline).
+    `show_progress` - lines/s, MB/s, percent done and ETA of reading a log4j log, on stderr.
+    """
+
+    graph_bucket = graph_bucket if print_executors_graph else None
+    parser = DbuParser(verbose, collect_timeline, graph_bucket)
+    parser.say(f"Processing {filename}")
+
+    if is_event_log(filename):
+        with open_log(filename) as f:
+            (linecount, stopped_at) = scan_event_log(f, parser)
+        parser.say(f"{linecount:,} lines processed.")
+        parser.finish(stopped_at)
+        return parser
+
+    progress = log_progress(filename) if show_progress else None
+    with progress or nullcontext():
+        if cache is None or collect_timeline:
+            with open_log(filename) as f:
+                (linecount, line, tail) = scan_log(f, parser, progress=progress)
+        else:
+            (linecount, line) = scan_log_cached(filename, parser, cache, graph_bucket, progress)
+
+    parser.say(f"{linecount:,} lines processed.")
 
     parser.finalize(line)
 
+    return parser
+
+
+def scan_log_cached(filename: str, parser, cache: ResultCache, graph_bucket, progress=None):
+    """ scan_log() that resumes from and saves parser state to the cache. Returns (number of lines, last line) """
+
+    st = os.stat(filename)
+    entry = cache.lookup(filename, st, graph_bucket, parser.state_attributes)
+
+    if entry and st.st_size == entry["size"]:
+        # unchanged since the last run - the log isn't even opened
+        parser.set_state(entry["state"])
+        parser.say("Using cached result")
+        (linecount, line, tail) = (entry["linecount"], entry["last_line"], bytes.fromhex(entry["tail"]))
+    else:
+        with open_log(filename) as f:
+            if entry:
+                fingerprint_at = max(0, entry["offset"] - cache.fingerprint_bytes)
+                f.seek(fingerprint_at)
+                if f.read(entry["offset"] - fingerprint_at).hex() != entry["fingerprint"]:
+                    entry = None        # not the same content up to the offset
+                    f.seek(0)
+
+            if entry:
+                parser.set_state(entry["state"])
+                (linecount, line) = (entry["linecount"], entry["last_line"])
+                parser.say(f"Resuming from byte {entry['offset']:,} ({linecount:,} lines processed before)")
+            else:
+                (linecount, line) = (0, "")
+
+            (linecount, last_line, tail) = scan_log(f, parser, linecount=linecount, final=False, progress=progress)
+            line = last_line or line
+            offset = f.tell() - len(tail)
+            fingerprint_at = max(0, offset - cache.fingerprint_bytes)
+            f.seek(fingerprint_at)
+            fingerprint = f.read(offset - fingerprint_at).hex()
+
+        cache.store(filename, st, dict(offset=offset, fingerprint=fingerprint, tail=tail.hex(),
+                                       linecount=linecount, last_line=line, graph_bucket=graph_bucket,
+                                       state=parser.get_state()))
+        cache.evict()
+
+    if tail:        # last line without a newline yet - processed, but not a part of the saved state
+        (linecount, line, tail) = scan_log(io.BytesIO(tail), parser, linecount=linecount)
+
+    return linecount, line
+
+
+def main_parallel(filename: str, print_executors_graph: bool = True, processes: int = None,
+                  verbose: bool = True, graph_bucket: float = 60, show_progress: bool = False):
+    """
+    Same as main(), but splits the log into byte ranges that are processed in a process pool.
+    Partial summaries are merged into exactly the totals and graph of a sequential run.
+    With `show_progress`, workers count lines and bytes in shared memory that the parent reports.
+    """
+
+    if (not os.path.getsize(filename) or os.path.splitext(filename)[1].lower() in compressed_openers
+            or is_event_log(filename)):
+        return main(filename, print_executors_graph, verbose, graph_bucket=graph_bucket, show_progress=show_progress)
+
+    graph_bucket = graph_bucket if print_executors_graph else None
+    parser = DbuParser(verbose, graph_bucket=graph_bucket)
+    parser.say(f"Processing {filename}")
+
+    processes = processes or os.cpu_count()
+    ranges = split_ranges(filename, processes * 4)      # more ranges than workers to even out the load
+
+    progress = log_progress(filename, processes) if show_progress else None
+    with progress or nullcontext(), ProcessPoolExecutor(processes, **(progress.pool_args() if progress else {})) as pool:
+        partials = list(pool.map(summarize_range, *zip(*[(filename, start, end, graph_bucket, show_progress)
+                                                         for (start, end) in ranges])))
+
+    parser.first_line(partials[0].first_line_prefix)
+    parser.merge_partials(partials)
+
+    parser.say(f"{sum(p.line_count for p in partials):,} lines processed.")
+
+    parser.finalize(partials[-1].last_line_prefix)
+
+    return parser
+
+
+def follow_lines(filename: str, stop: threading.Event, poll_interval: float = 1.0):
+    """
+    Yields complete lines appended to a file (tail -f), starting from its beginning.
+    Yields None every time it has to wait for new data, so caller can do periodic work.
+
+    Waits with stop.wait() - polling backs off from 50ms up to poll_interval while the file is idle.
+    Follows log rotation (path now points to a new file - the rest of the old file is read first)
+    and truncation (file got shorter than what was read - reading restarts from its beginning);
+    an unterminated last line of the old file is yielded before that.
+    """
+
+    f = open(filename, "rb")
+    offset = 0
+    tail = b""
+    delay = 0.05
+    try:
+        while not stop.is_set():
+            chunk = f.read(1 << 20)
+            if chunk:
+                offset += len(chunk)
+                lines = (tail + chunk).split(b"\n")
+                tail = lines.pop()
+                for line in lines:
+                    yield line.decode(errors="replace") + "\n"
+                delay = 0.05
+                continue
+
+            # no new data - check if file was rotated or truncated
+            try:
+                st = os.stat(filename)
+            except FileNotFoundError:
+                st = None           # rotated away, new file not created yet
+            rotated = st is not None and st.st_ino != os.fstat(f.fileno()).st_ino
+            if rotated or (st is not None and st.st_size < offset):
+                if tail:        # the old file's last line, that will never get its newline
+                    yield tail.decode(errors="replace") + "\n"
+                    tail = b""
+                if rotated:
+                    f.close()
+                    f = open(filename, "rb")
+                else:
+                    f.seek(0)
+                offset = 0
+                continue
+
+            yield None
+            stop.wait(delay)
+            delay = min(delay * 2, poll_interval)
+    finally:
+        f.close()
+
+    if tail:
+        yield tail.decode(errors="replace")
+
+
+def main_follow(filename: str, print_executors_graph: bool = True, status_interval: float = 60.0,
+                poll_interval: float = 1.0, stop: threading.Event = None, graph_bucket: float = 60):
+    """
+    Follows a log of a running job: only newly appended bytes are processed, and running integral,
+    current/max executors are updated as lines arrive. Completed graph buckets are printed with the status.
+    Runs until `stop` is set or Ctrl-C, then finalizes accounting at the last line seen.
+    """
+
+    if is_event_log(filename):
+        raise ValueError("Follow mode supports log4j driver logs only")
+
+    stop = stop or threading.Event()
+
+    parser = DbuParser(graph_bucket=graph_bucket if print_executors_graph else None)
+    parser.say(f"Following {filename}")
+
+    linecount = 0
+    line = last_status_line = None      # last line with a log4j timestamp
+    next_status_at = 0
+
+    try:
+        for new_line in follow_lines(filename, stop, poll_interval):
+            if new_line is not None:
+                if not linecount:
+                    parser.first_line(new_line)
+
+                linecount += 1
+
+                parser.try_match(new_line)
+
+                if Log4jTimeDecoder.fixed_width(new_line[0:17]):
+                    line = new_line
+
+            if line is not last_status_line and monotonic() >= next_status_at:
+                parser.checkpoint(parser.time_decoder.parse_ts(line[0:17]))
+                parser.print_graph(until_ts=parser.previous_checkpoint_ts)
+                parser.status(line)
+                last_status_line = line
+                next_status_at = monotonic() + status_interval
+    except KeyboardInterrupt:
+        pass
+
+    parser.say(f"{linecount:,} lines processed.")
+
+    if line is not None:
+        parser.finalize(line)
+
+    return parser
+
+
+def parse_duration(duration: str):
+    """ '10s', '5m', '1h', '1d' or plain seconds """
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if duration[-1:].lower() in units:
+        return float(duration[:-1]) * units[duration[-1].lower()]
+    return float(duration)
+
+
+report_columns = ["file", "started_at", "finished_at", "driver_minutes", "max_executors", "avg_executors",
+                  "worker_minutes", "dbus", "error"]
+
+
+def expand_inputs(paths):
+    """ Resolves files, directories (recursively) and glob patterns into a sorted list of unique files """
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for (dirpath, dirnames, filenames) in os.walk(path):
+                files.extend(os.path.join(dirpath, name) for name in filenames)
+        elif glob.has_magic(path):
+            files.extend(f for f in glob.glob(path, recursive=True) if os.path.isfile(f))
+        else:
+            files.append(path)
+    return sorted(set(files))
+
+
+def job_summary(filename: str, dbu_rate: float = 1.0, cache: ResultCache = None):
+    """
+    Process pool worker - one report row for a log file.
+    DBUs are charged at `dbu_rate` per node-hour, for the driver and every executor.
+    """
+
+    row = dict.fromkeys(report_columns)
+    row["file"] = filename
+    try:
+        parser = main(filename, print_executors_graph=False, verbose=False, cache=cache)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+        return row
+
+    nice_time_format = "%Y-%m-%d %H:%M:%S"
+    row.update(started_at=strftime(nice_time_format, localtime(parser.started_at)),
+               finished_at=strftime(nice_time_format, localtime(parser.stopped_at)),
+               driver_minutes=round(parser.total_runtime / 60, 1),
+               max_executors=parser.max_executors,
+               avg_executors=round(parser.avg_executors, 1),
+               worker_minutes=round(parser.integral_seconds / 60, 1),
+               dbus=round((parser.total_runtime + parser.integral_seconds) / 3600 * dbu_rate, 2))
+    return row
+
+
+def report_totals(rows):
+    ok = [row for row in rows if not row["error"]]
+    totals = dict.fromkeys(report_columns)
+    totals["file"] = f"TOTAL ({len(ok)} jobs, {len(rows) - len(ok)} errors)"
+    if ok:
+        driver_minutes = sum(row["driver_minutes"] for row in ok)
+        worker_minutes = sum(row["worker_minutes"] for row in ok)
+        totals.update(started_at=min(row["started_at"] for row in ok),
+                      finished_at=max(row["finished_at"] for row in ok),
+                      driver_minutes=round(driver_minutes, 1),
+                      max_executors=max(row["max_executors"] for row in ok),
+                      avg_executors=round(worker_minutes / driver_minutes, 1) if driver_minutes else 0,
+                      worker_minutes=round(worker_minutes, 1),
+                      dbus=round(sum(row["dbus"] for row in ok), 2))
+    return totals
+
+
+def write_report(rows, totals, output=None, output_format: str = "csv"):
+    out = open(output, "w", newline="") if output else sys.stdout
+    try:
+        if output_format == "json":
+            json.dump({"jobs": rows, "totals": totals}, out, indent=2)
+            out.write("\n")
+        else:
+            writer = csv.DictWriter(out, fieldnames=report_columns)
+            writer.writeheader()
+            writer.writerows(rows)
+            writer.writerow(totals)
+    finally:
+        if output:
+            out.close()
+
+
+def main_batch(paths, processes: int = None, dbu_rate: float = 1.0, output=None, output_format: str = "csv",
+               cache: ResultCache = None, show_progress: bool = False):
+    """
+    Processes many logs (files, directories or glob patterns) concurrently in a process pool
+    and writes one report - a row per job plus totals - as csv or json.
+    `show_progress` - logs/s, percent done and ETA on stderr.
+    Returns (rows, totals).
+    """
+
+    files = expand_inputs(paths)
+    if not files:
+        raise ValueError(f"No log files found in {', '.join(paths)}")
+
+    processes = processes or os.cpu_count()
+    progress = None
+    if show_progress:
+        from spinner import Progress
+        progress = Progress("Processed", unit="logs", total_items=len(files))
+    rows = []
+    with progress or nullcontext(), ProcessPoolExecutor(processes) as pool:
+        for row in pool.map(job_summary, files, repeat(dbu_rate), repeat(cache),
+                            chunksize=max(1, len(files) // (processes * 8))):
+            rows.append(row)
+            if progress:
+                progress.items += 1
+
+    totals = report_totals(rows)
+    write_report(rows, totals, output, output_format)
+    return rows, totals
+
 
 if __name__ == '__main__':
-    if len(sys.argv) <= 1:
-        print(f"{sys.argv[0]} <input_log4j.txt>")
-        sys.exit(2)
+    import argparse
+
+    args_parser = argparse.ArgumentParser(description="Executor-minutes / DBU accounting from Spark log4j driver logs "
+                                                      "or Spark JSON event logs")
+    args_parser.add_argument("filenames", metavar="input_log4j.txt", nargs="+",
+                             help="log file(s); directories and glob patterns are processed in batch mode")
+    args_parser.add_argument("--no-graph", action="store_true", help="don't print graph of number of executors")
+    args_parser.add_argument("--graph-bucket", metavar="duration", type=parse_duration, default=60,
+                             help="graph bucket width, e.g. 10s, 1m, 5m, 1h (default: 1m)")
+    args_parser.add_argument("-j", "--parallel", metavar="N", type=int, default=None,
+                             help="use N processes (0 - all CPUs): byte ranges of a single log, or logs in batch mode")
+    args_parser.add_argument("-f", "--follow", action="store_true",
+                             help="keep following a log of a running job (like tail -f), until Ctrl-C")
+    args_parser.add_argument("--status-interval", metavar="seconds", type=float, default=60.0,
+                             help="how often follow mode prints running totals (default: 60)")
+    args_parser.add_argument("--timeline", metavar="file.npz",
+                             help="save executors timeline (.npz or .npy) for later analysis with ExecutorTimeline")
+    args_parser.add_argument("--format", choices=["csv", "json"], default=None,
+                             help="batch mode report format (default: csv)")
+    args_parser.add_argument("-o", "--output", metavar="report", help="write batch mode report to a file")
+    args_parser.add_argument("--dbu-rate", type=float, default=1.0,
+                             help="DBUs per node-hour, charged for the driver and each executor (default: 1.0)")
+    args_parser.add_argument("--cache", action="store_true",
+                             help="reuse results of previous runs: unchanged logs aren't read again "
+                                  "and appended logs are read from where the previous run stopped")
+    args_parser.add_argument("--cache-dir", metavar="dir", default=default_cache_dir,
+                             help=f"cache location (default: {default_cache_dir})")
+    args_parser.add_argument("--cache-max-age", metavar="days", type=float, default=7,
+                             help="evict cache entries not used for this many days (default: 7)")
+    args_parser.add_argument("--cache-max-size", metavar="MB", type=float, default=64,
+                             help="evict least recently used cache entries above this size (default: 64)")
+    args_parser.add_argument("--progress", action="store_true",
+                             help="show lines/s, MB/s, percent done and ETA (logs/s in batch mode) on stderr")
+    args = args_parser.parse_args()
+
+    cache = ResultCache(args.cache_dir, args.cache_max_age, args.cache_max_size) if args.cache else None
+
+    single_file = (len(args.filenames) == 1 and os.path.isfile(args.filenames[0])
+                   and not (args.format or args.output))
 
-    main(sys.argv[1])
+    if args.follow:
+        if len(args.filenames) != 1:
+            args_parser.error("--follow takes exactly one log file")
+        main_follow(args.filenames[0], not args.no_graph, args.status_interval, graph_bucket=args.graph_bucket)
+    elif not single_file:
+        main_batch(args.filenames, args.parallel or None, args.dbu_rate, args.output, args.format or "csv", cache,
+                   args.progress)
+    elif args.parallel is None or args.timeline or cache:
+        parser = main(args.filenames[0], not args.no_graph, collect_timeline=bool(args.timeline),
+                      graph_bucket=args.graph_bucket, cache=cache, show_progress=args.progress)
+        if args.timeline:
+            parser.timeline.save(args.timeline)
+            (p50, p90, p99) = parser.timeline.percentiles()
+            print(f"Executors p50: {p50}; p90: {p90}; p99: {p99}; timeline saved to {args.timeline}")
+    else:
+        main_parallel(args.filenames[0], not args.no_graph, args.parallel or None, graph_bucket=args.graph_bucket,
+                      show_progress=args.progress)
@@ -0,0 +1,185 @@
+#!python
+
+# Benchmarks for dbus.py
+#
+# Usage:
+#   python ./dbus_bench.py [<input_log4j.txt>] [--size=100MB] [--parallel=N] [--profile]
+#
+# Without an input file a synthetic log4j driver log is generated with spark_log_gen.py.
+# Reports lines/sec, MB/sec and peak RSS for dbus.main() / dbus.main_parallel(),
+# throughput of DbuParser methods, and with --profile a per-stage breakdown of dbus.main().
+
+import os
+import io
+import pstats
+import cProfile
+import argparse
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+import dbus
+from dbus import DbuParser, Log4jTimeDecoder, ExecutorHistogram
+from spark_log_gen import generate_log, parse_size
+
+
+def timed(label: str, func, items, unit: str = "lines"):
+    started = perf_counter()
+    for item in items:
+        func(item)
+    elapsed = perf_counter() - started
+    print(f"{label:<40} {len(items) / elapsed:>14,.0f} {unit}/sec")
+    return elapsed
+
+
+def bench_time_decoding(lines):
+    print(f"Timestamp decoding, {len(lines):,} lines")
+    prefixes = [line[0:17] for line in lines]
+
+    before = timed("strptime parse_time", DbuParser.parse_time, prefixes)
+    before += timed("strptime + mktime parse_ts", DbuParser.parse_ts, prefixes)
+
+    decoder = Log4jTimeDecoder()
+    after = timed("Log4jTimeDecoder.parse_time", decoder.parse_time, prefixes)
+    decoder = Log4jTimeDecoder()
+    after += timed("Log4jTimeDecoder.parse_ts", decoder.parse_ts, prefixes)
+
+    print(f"speedup {before / after:.1f}x")
+
+
+def bench_methods(filename: str):
+    """ Throughput of DbuParser methods on event lines of the log """
+
+    with dbus.open_log(filename) as f:
+        events = [line.decode(errors="replace") for line in f if dbus.event_marker in line]
+    if not events:
+        print("No executor events in the log")
+        return
+    print(f"DbuParser methods, {len(events):,} event lines")
+
+    parser = DbuParser(verbose=False)
+    matches = [parser.re_parser.match(line).groups() for line in events]
+    timestamps = [parser.time_decoder.parse_ts(when) for (when, what) in matches]
+
+    timed("re_parser.match", parser.re_parser.match, events)
+    timed("try_match", DbuParser(verbose=False).try_match, events)
+
+    parser = DbuParser(verbose=False)
+    parser.first_line(events[0])
+    timed("match_process", lambda i: parser.match_process(timestamps[i], matches[i][1]),
+          range(len(events)), "events")
+
+    parser = DbuParser(verbose=False, graph_bucket=60)
+    parser.first_line(events[0])
+    timed("match_process + 1m histogram", lambda i: parser.match_process(timestamps[i], matches[i][1]),
+          range(len(events)), "events")
+
+    histogram = ExecutorHistogram(10)
+    timed("ExecutorHistogram(10s).add_interval",
+          lambda i: histogram.add_interval(timestamps[i - 1], timestamps[i], i % 50), range(1, len(events)),
+          "intervals")
+
+
+def run_main(filename: str, processes: int = None, graph: bool = True):
+    """ Child process - runs dbus.main (or dbus.main_parallel) quietly, returns (seconds, lines, peak RSS KB) """
+
+    started = perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        if processes:
+            dbus.main_parallel(filename, graph, processes)
+        else:
+            dbus.main(filename, graph)
+    elapsed = perf_counter() - started
+
+    lines = next(int(line.split()[0].replace(",", "")) for line in out.getvalue().splitlines()
+                 if line.endswith(" lines processed."))
+    peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return elapsed, lines, peak_rss
+
+
+def bench_main(filename: str, processes: int = None):
+    size_mb = os.path.getsize(filename) / (1 << 20)
+    print(f"dbus.main, {filename} ({size_mb:,.1f} MB)")
+
+    runs = [("main", None, True), ("main --no-graph", None, False)]
+    if processes:
+        runs.append((f"main_parallel -j {processes}", processes, True))
+
+    # every run in a fresh process, so peak RSS belongs to that run only
+    context = multiprocessing.get_context("spawn")
+    for (label, run_processes, graph) in runs:
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            (elapsed, lines, peak_rss) = pool.submit(run_main, filename, run_processes, graph).result()
+        print(f"{label:<40} {lines / elapsed:>14,.0f} lines/sec {size_mb / elapsed:>10,.1f} MB/sec "
+              f"{peak_rss / 1024:>8,.1f} MB peak RSS")
+
+
+profile_stages = [
+    # (stage, predicate on pstats function key (filename, line number, function name))
+    ("I/O", lambda key: key[2].startswith(("<method 'read'", "<built-in method io.open", "<method 'seek'"))),
+    ("regex", lambda key: "re.Pattern" in key[2]),
+    ("time parsing", lambda key: "_strptime" in key[0] or key[2] in ("parse_ts", "parse_time", "load_minute",
+                                                                     "fixed_width", "<built-in method time.mktime>")),
+    ("graph", lambda key: key[2] in ("add_interval", "merge", "rows", "render", "print_graph")),
+    ("accounting", lambda key: key[2] in ("match_process", "try_match", "checkpoint")),
+    ("scan (prefilter, line counting)", lambda key: key[2] == "scan_log" or key[2].startswith(
+        ("<method 'find' of 'bytes", "<method 'rfind' of 'bytes", "<method 'count' of 'bytes", "<method 'decode'"))),
+]
+
+
+def bench_profile(filename: str):
+    """ Per-stage breakdown of dbus.main() with a graph, from cProfile's own time of every function """
+
+    profiler = cProfile.Profile()
+    with contextlib.redirect_stdout(io.StringIO()):
+        profiler.runcall(dbus.main, filename, True)
+    stats = pstats.Stats(profiler).stats      # key -> (calls, primitive calls, tottime, cumtime, callers)
+
+    totals = dict.fromkeys([stage for (stage, predicate) in profile_stages] + ["other"], 0.0)
+    for (key, (calls, primitive_calls, tottime, cumtime, callers)) in stats.items():
+        stage = next((stage for (stage, predicate) in profile_stages if predicate(key)), "other")
+        totals[stage] += tottime
+
+    total = sum(totals.values())
+    print(f"dbus.main stages (profiled, {total:.2f}s)")
+    for (stage, seconds) in totals.items():
+        print(f"{stage:<40} {seconds:>8.3f}s {seconds / total:>6.1%}")
+
+
+if __name__ == '__main__':
+    args_parser = argparse.ArgumentParser(description="dbus.py benchmarks")
+    args_parser.add_argument("filename", metavar="input_log4j.txt", nargs="?",
+                             help="log to benchmark on (default: generate a synthetic one)")
+    args_parser.add_argument("--size", default="100MB", help="size of the synthetic log, e.g. 20MB, 1GB")
+    args_parser.add_argument("-j", "--parallel", metavar="N", type=int, default=0,
+                             help="also benchmark main_parallel with N processes")
+    args_parser.add_argument("--profile", action="store_true", help="per-stage profile of dbus.main")
+    args_parser.add_argument("--skip-timestamps", action="store_true", help="skip timestamp decoding benchmark")
+    args = args_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = args.filename
+        if not filename:
+            filename = os.path.join(tmp_dir, "driver.log")
+            (line_count, event_count) = generate_log(filename, parse_size(args.size))
+            print(f"Generated {filename}: {line_count:,} lines, {event_count:,} executor events\n")
+
+        if not args.skip_timestamps:
+            with dbus.open_log(filename) as f:
+                bench_lines = [line.decode(errors="replace") for line in f
+                               if Log4jTimeDecoder.fixed_width(line[0:17].decode(errors="replace"))]
+            bench_time_decoding(bench_lines)
+            del bench_lines
+            print()
+
+        bench_methods(filename)
+        print()
+        bench_main(filename, args.parallel)
+
+        if args.profile:
+            print()
+            bench_profile(filename)
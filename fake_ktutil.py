@@ -0,0 +1,119 @@
+#!python
+
+# Stand-in for MIT Kerberos ktutil - for testing keytab.py without Kerberos installed
+#
+# Usage:
+#   python ./keytab.py batch principals.txt --ktutil="python ./fake_ktutil.py"
+#
+# Understands the ktutil requests keytab.py uses: addent -password, read_kt, write_kt, clear_list, list, quit.
+# Keytabs are written in MIT keytab format (0x502) by keytab.py's code, but keys are not real Kerberos keys -
+# they're derived from the password with PBKDF2, just so that different passwords give different keys.
+# Password is read with echo off and without flushing type-ahead input, as MIT ktutil does.
+# FAKE_KTUTIL_DELAY environment variable adds that many seconds to every request (slow KDC-less ktutil).
+
+import os
+import sys
+import time
+import hashlib
+
+from keytab import KeytabError, KeytabEntry, keytab_version, pack_entry, parse_keytab
+
+prompt = 'ktutil:  '
+
+# enctype name -> (enctype number, key length)
+enctypes = {
+    'des3-cbc-sha1': (16, 24),
+    'aes128-cts': (17, 16), 'aes128-cts-hmac-sha1-96': (17, 16),
+    'aes256-cts': (18, 32), 'aes256-cts-hmac-sha1-96': (18, 32),
+    'rc4-hmac': (23, 16), 'arcfour-hmac': (23, 16),
+}
+
+delay = float(os.environ.get('FAKE_KTUTIL_DELAY', 0))
+
+
+def read_password(message):
+    if not sys.stdin.isatty():
+        sys.stdout.write(message)
+        sys.stdout.flush()
+        return sys.stdin.readline().rstrip('\n')
+
+    import termios
+    fd = sys.stdin.fileno()
+    old = termios.tcgetattr(fd)
+    new = termios.tcgetattr(fd)
+    new[3] &= ~(termios.ECHO | termios.ECHONL)
+    termios.tcsetattr(fd, termios.TCSANOW, new)     # TCSANOW - type-ahead input is kept
+    try:
+        sys.stdout.write(message)       # echo is off before the prompt shows up
+        sys.stdout.flush()
+        password = sys.stdin.readline().rstrip('\n')
+    finally:
+        termios.tcsetattr(fd, termios.TCSANOW, old)
+    sys.stdout.write('\n')
+    return password
+
+
+def addent(words, keylist):
+    if '-password' not in words or '-p' not in words or '-k' not in words or '-e' not in words:
+        print('usage: addent (-key | -password) -p principal -k kvno -e enctype')
+        return
+    principal = words[words.index('-p') + 1]
+    kvno = int(words[words.index('-k') + 1])
+    enctype = words[words.index('-e') + 1]
+    password = read_password('Password for %s: ' % principal)
+    if enctype not in enctypes:
+        print('addent: Bad encryption type while adding new entry')
+        return
+    (number, length) = enctypes[enctype]
+    key = hashlib.pbkdf2_hmac('sha1', password.encode(), principal.encode(), 1, length)
+    keylist.append(KeytabEntry(principal, kvno, number, key, int(time.time()), 1))
+
+
+def main():
+    keylist = []
+    while True:
+        try:
+            line = input(prompt)
+        except EOFError:
+            break
+        words = line.split()
+        if not words:
+            continue
+        if delay:
+            time.sleep(delay)
+        request = words[0]
+
+        if request == 'addent':
+            addent(words, keylist)
+        elif request in ('write_kt', 'wkt') and len(words) == 2:
+            exists = os.path.exists(words[1])
+            try:
+                with open(words[1], 'ab') as f:        # MIT ktutil appends to an existing keytab
+                    if not exists:
+                        f.write(keytab_version)
+                    f.write(b''.join(pack_entry(entry) for entry in keylist))
+            except (IOError, OSError) as e:
+                print('write_kt: %s while writing keytab "%s"' % (e.strerror, words[1]))
+        elif request in ('read_kt', 'rkt') and len(words) == 2:
+            try:
+                with open(words[1], 'rb') as f:
+                    keylist.extend(parse_keytab(f.read()))
+            except (IOError, OSError) as e:
+                print('read_kt: %s while reading keytab "%s"' % (e.strerror, words[1]))
+            except KeytabError as e:
+                print('read_kt: %s while reading keytab "%s"' % (e, words[1]))
+        elif request in ('clear_list', 'clear'):
+            del keylist[:]
+        elif request in ('list', 'l'):
+            print('slot KVNO Principal')
+            print('---- ---- ' + '-' * 67)
+            for (slot, entry) in enumerate(keylist, 1):
+                print('%4d %4d %51s' % (slot, entry.kvno, entry.principal))
+        elif request in ('quit', 'q', 'exit'):
+            break
+        else:
+            print('ktutil: Unknown request "%s".  Type "?" for a request list.' % request)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+#!python
+
+# I/O benchmark and latency profiler of FUSE mounts (or any directory, to compare with local disk)
+#
+# Usage:
+#   python ./fuse_bench.py [/hdfs_mount/some/dir ...] [--workloads=stat,listdir,read,parallel,mmap]
+#                          [--block-sizes=4K,64K,1M,4M] [--workers=8] [--pool=thread|process]
+#                          [--create-files=N --file-size=16M] [--output=report.json] [--max-p99-ms=N]
+#
+# Directories default to the mounts fuse_monitor.py watches (FUSE_MOUNTS, or /hdfs_mount).
+# Every directory is first checked by fuse_monitor's probes; a HUNG or UNMOUNTED one isn't benchmarked.
+# Workloads:
+#   stat     - stat() storm over files of the directory tree
+#   listdir  - listdir() storm over its directories
+#   read     - sequential reads of files with each of --block-sizes
+#   parallel - files read concurrently by --workers threads or processes
+#   mmap     - files read through mmap, a block at a time
+# Reads are bounded by --max-bytes per workload; page cache of local files is dropped before reads
+# (posix_fadvise), FUSE mounts may not honour that.
+# The JSON report has throughput and p50/p99 latencies of every workload - of each call
+# (stat, listdir, read of a block). With --max-p99-ms it's a deeper health check: exits with 1
+# if a directory failed its probe or any workload's p99 latency is above that.
+
+import os
+import sys
+import json
+import math
+import mmap
+import time
+import shutil
+import argparse
+from array import array
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import fuse_monitor
+
+all_workloads = ("stat", "listdir", "read", "parallel", "mmap")
+
+
+def parse_size(size: str):
+    """ '4K', '64K', '1M', '2G' or plain bytes """
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    size = size.upper().rstrip("B")
+    return int(float(size[:-1]) * units[size[-1]]) if size[-1:] in units else int(size)
+
+
+def find_files(directory: str, max_files: int):
+    """ (files, directories) of the tree, breadth first - at most max_files regular files, skipping empty ones """
+
+    (files, directories) = ([], [directory])
+    for current in directories:
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(entry.path)
+            elif entry.is_file(follow_symlinks=False) and len(files) < max_files and entry.stat().st_size:
+                files.append(entry.path)
+        if len(files) >= max_files:
+            break
+    return files, directories
+
+
+def create_files(directory: str, count: int, size: int):
+    """ count files of `size` bytes in a scratch subdirectory; returns it """
+
+    scratch = os.path.join(directory, f".fuse_bench.{os.getpid()}")
+    os.mkdir(scratch)
+    block = os.urandom(min(size, 1 << 20))
+    for i in range(count):
+        with open(os.path.join(scratch, f"file-{i:05d}"), "wb") as f:
+            for offset in range(0, size, len(block)):
+                f.write(block[:size - offset])
+    return scratch
+
+
+def drop_cache(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except (OSError, AttributeError):
+        pass
+
+
+def percentile(latencies, q: float):
+    """ q-th percentile of sorted latencies, nearest rank """
+    if not latencies:
+        return None
+    return latencies[min(len(latencies) - 1, max(0, math.ceil(q * len(latencies) / 100) - 1))]
+
+
+def summarize(latencies, elapsed: float, nbytes: int = 0, errors: int = 0, **extra):
+    """ Workload result: ops and bytes per second, latencies in ms """
+
+    latencies = sorted(latencies)
+    result = dict(ops=len(latencies), errors=errors, seconds=round(elapsed, 4),
+                  ops_per_s=round(len(latencies) / elapsed, 1) if elapsed else None)
+    if nbytes:
+        result.update(bytes=nbytes, mb_per_s=round(nbytes / elapsed / (1 << 20), 1) if elapsed else None)
+    result.update(p50_ms=round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+                  p99_ms=round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+                  max_ms=round(latencies[-1] * 1000, 3) if latencies else None, **extra)
+    return result
+
+
+def timed_calls(func, args, repeat: int = 1):
+    """ Latencies of func(arg) for every arg, `repeat` times over; returns (latencies, errors, elapsed) """
+
+    (latencies, errors) = (array("d"), 0)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for arg in args:
+            t0 = time.perf_counter()
+            try:
+                func(arg)
+            except OSError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - t0)
+    return latencies, errors, time.perf_counter() - started
+
+
+def read_file(path: str, block_size: int, max_bytes: int, use_mmap: bool = False):
+    """ Reads up to max_bytes of the file a block at a time; returns (bytes read, latencies of reads) """
+
+    latencies = array("d")
+    nbytes = 0
+    with open(path, "rb", buffering=0) as f:
+        if use_mmap:
+            size = min(os.fstat(f.fileno()).st_size, max_bytes)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for offset in range(0, size, block_size):
+                    t0 = time.perf_counter()
+                    nbytes += len(mm[offset:offset + block_size])     # copying the slice faults the pages in
+                    latencies.append(time.perf_counter() - t0)
+        else:
+            buffer = bytearray(block_size)
+            while nbytes < max_bytes:
+                t0 = time.perf_counter()
+                n = f.readinto(buffer)
+                if not n:       # the read that hits EOF transfers nothing - not an op
+                    break
+                latencies.append(time.perf_counter() - t0)
+                nbytes += n
+    return nbytes, latencies
+
+
+def read_files(files, block_size: int, max_bytes: int, use_mmap: bool = False):
+    """ Sequential reads of files until max_bytes in total; returns (bytes, latencies, errors) """
+
+    (nbytes, latencies, errors) = (0, array("d"), 0)
+    for path in files:
+        if nbytes >= max_bytes:
+            break
+        drop_cache(path)
+        try:
+            (n, file_latencies) = read_file(path, block_size, max_bytes - nbytes, use_mmap)
+        except (OSError, ValueError):      # ValueError - mmap of an empty file
+            errors += 1
+            continue
+        nbytes += n
+        latencies.extend(file_latencies)
+    return nbytes, latencies, errors
+
+
+def bench_directory(directory: str, workloads, block_sizes, workers: int = 8, pool: str = "thread",
+                    max_files: int = 200, max_bytes: int = 256 << 20, repeat: int = 3):
+    """ Runs workloads on files found under directory; returns {workload: result} """
+
+    (files, directories) = find_files(directory, max_files)
+    results = {}
+
+    if "stat" in workloads:
+        (latencies, errors, elapsed) = timed_calls(os.stat, files + directories, repeat)
+        results["stat"] = summarize(latencies, elapsed, errors=errors)
+    if "listdir" in workloads:
+        (latencies, errors, elapsed) = timed_calls(os.listdir, directories, repeat)
+        results["listdir"] = summarize(latencies, elapsed, errors=errors)
+    if not files:
+        return results
+
+    for block_size in block_sizes:
+        if "read" in workloads:
+            started = time.perf_counter()
+            (nbytes, latencies, errors) = read_files(files, block_size, max_bytes)
+            results[f"read {block_size}"] = summarize(latencies, time.perf_counter() - started, nbytes, errors,
+                                                      block_size=block_size)
+        if "mmap" in workloads:
+            started = time.perf_counter()
+            (nbytes, latencies, errors) = read_files(files, block_size, max_bytes, use_mmap=True)
+            results[f"mmap {block_size}"] = summarize(latencies, time.perf_counter() - started, nbytes, errors,
+                                                      block_size=block_size)
+
+    if "parallel" in workloads:
+        block_size = max(block_sizes)
+        shares = [files[i::workers] for i in range(min(workers, len(files)))]
+        executor = ProcessPoolExecutor if pool == "process" else ThreadPoolExecutor
+        started = time.perf_counter()
+        with executor(len(shares)) as pool_executor:
+            parts = list(pool_executor.map(read_files, shares, [block_size] * len(shares),
+                                           [max_bytes // len(shares)] * len(shares)))
+        elapsed = time.perf_counter() - started
+        latencies = array("d")
+        for (nbytes, part_latencies, errors) in parts:
+            latencies.extend(part_latencies)
+        results["parallel"] = summarize(latencies, elapsed, sum(p[0] for p in parts), sum(p[2] for p in parts),
+                                        block_size=block_size, workers=len(shares), pool=pool)
+    return results
+
+
+def mount_of(directory: str, mounts):
+    """ (mount point, filesystem type) that directory is on, by the longest matching mount point """
+    path = os.path.normpath(os.path.abspath(directory))
+    candidates = [m for m in mounts if path == m or path.startswith(m.rstrip("/") + "/")]
+    mount_point = max(candidates, key=len) if candidates else None
+    return mount_point, mounts.get(mount_point)
+
+
+def bench(directories, workloads=all_workloads, block_sizes=(4 << 10, 64 << 10, 1 << 20, 4 << 20),
+          workers: int = 8, pool: str = "thread", max_files: int = 200, max_bytes: int = 256 << 20,
+          repeat: int = 3, create: int = 0, file_size: int = 16 << 20, probe_timeout: float = 5.0):
+    """ Report of every directory: its mount, fuse_monitor probe status and workload results """
+
+    monitor = fuse_monitor.FuseMonitor(directories, timeout=probe_timeout, check_mounted=False)
+    statuses = monitor.check()
+    try:
+        mounts = fuse_monitor.read_mountinfo()
+    except OSError:
+        mounts = {}
+
+    report = {}
+    for (directory, state) in zip(directories, monitor.mounts):
+        (mount_point, fstype) = mount_of(directory, mounts)
+        entry = report[directory] = dict(mount_point=mount_point, fstype=fstype, status=statuses[directory])
+        if state.status == "ERROR":
+            entry["error"] = str(state.probe.error)
+        if state.status != "OK":
+            continue        # a hung mount would hang the benchmark too
+
+        scratch = create_files(directory, create, file_size) if create else None
+        try:
+            entry["workloads"] = bench_directory(scratch or directory, workloads, block_sizes, workers, pool,
+                                                 max_files, max_bytes, repeat)
+        finally:
+            if scratch:
+                shutil.rmtree(scratch, ignore_errors=True)
+    return report
+
+
+def unhealthy(report, max_p99_ms: float):
+    """ Directories that failed the probe, or with a workload whose p99 latency is above max_p99_ms """
+    return [directory for (directory, entry) in report.items()
+            if entry["status"] != "OK" or any(result.get("p99_ms") is not None and result["p99_ms"] > max_p99_ms
+                                              for result in entry.get("workloads", {}).values())]
+
+
+if __name__ == '__main__':
+
+    args_parser = argparse.ArgumentParser(description="I/O benchmark and latency profiler of FUSE mounts")
+    args_parser.add_argument("directories", metavar="directory", nargs="*",
+                             help="directories to benchmark (default: mounts of fuse_monitor.py - "
+                                  "FUSE_MOUNTS environment variable, or /hdfs_mount)")
+    args_parser.add_argument("--workloads", default=",".join(all_workloads),
+                             help=f"comma-separated workloads (default: {','.join(all_workloads)})")
+    args_parser.add_argument("--block-sizes", default="4K,64K,1M,4M",
+                             help="comma-separated read block sizes (default: 4K,64K,1M,4M)")
+    args_parser.add_argument("--workers", metavar="N", type=int, default=8,
+                             help="concurrent readers of the parallel workload (default: 8)")
+    args_parser.add_argument("--pool", choices=["thread", "process"], default="thread",
+                             help="parallel workload readers are threads or processes (default: thread)")
+    args_parser.add_argument("--max-files", metavar="N", type=int, default=200,
+                             help="use at most N files of the directory tree (default: 200)")
+    args_parser.add_argument("--max-bytes", metavar="size", type=parse_size, default="256M",
+                             help="read at most so many bytes per workload (default: 256M)")
+    args_parser.add_argument("--repeat", metavar="N", type=int, default=3,
+                             help="stat and listdir storms go over the tree N times (default: 3)")
+    args_parser.add_argument("--create-files", metavar="N", type=int, default=0,
+                             help="benchmark on N new files in a scratch subdirectory, removed afterwards")
+    args_parser.add_argument("--file-size", metavar="size", type=parse_size, default="16M",
+                             help="size of --create-files files (default: 16M)")
+    args_parser.add_argument("--probe-timeout", metavar="seconds", type=float, default=5.0,
+                             help="fuse_monitor probe timeout before a directory is benchmarked (default: 5)")
+    args_parser.add_argument("-o", "--output", metavar="report.json", help="write JSON report to a file")
+    args_parser.add_argument("--max-p99-ms", metavar="ms", type=float,
+                             help="health check: exit with 1 if any p99 latency is above this")
+    args = args_parser.parse_args()
+
+    workloads = [w.strip() for w in args.workloads.split(",") if w.strip()]
+    unknown = set(workloads) - set(all_workloads)
+    if unknown:
+        args_parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+
+    report = bench(fuse_monitor.configured_mounts(args.directories), workloads,
+                   [parse_size(size) for size in args.block_sizes.split(",")], args.workers, args.pool,
+                   args.max_files, args.max_bytes, args.repeat, args.create_files, args.file_size,
+                   args.probe_timeout)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.max_p99_ms is not None:
+        failed = unhealthy(report, args.max_p99_ms)
+        if failed:
+            sys.exit(f"Unhealthy: {', '.join(failed)}")
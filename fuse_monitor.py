@@ -0,0 +1,324 @@
+#!python
+
+# Health monitor of FUSE mounts (e.g. HDFS fuse mount) - Python successor of hdfs_fuse_mount_monitor.sh
+#
+# Usage:
+#   python ./fuse_monitor.py [/hdfs_mount ...] [--interval=10] [--timeout=5] [--failures-before-fix=3]
+#                            [--fix-command="..."] [--mail-to=address] [--once]
+#
+# Mount points are given as arguments, or in FUSE_MOUNTS environment variable (colon-separated),
+# /hdfs_mount by default. All mounts are probed concurrently with cheap stat() and statvfs() calls
+# (not an `ls` of a possibly huge directory), each bounded by --timeout.
+# A mount that isn't in /proc/self/mountinfo is reported as UNMOUNTED, not as a hang.
+# A mount is remediated (--fix-command, by default `fusermount -uz` and `mount` as the shell script does)
+# after --failures-before-fix failed checks in a row; repeated fixes of a mount back off exponentially.
+# Latency histogram of every mount is logged every --report-interval seconds.
+#
+# With --once, checks mounts one time, fixes failed ones and exits with 1 if any failed (a cron job,
+# like the shell script); otherwise runs until interrupted.
+
+import os
+import re
+import sys
+import json
+import shlex
+import time
+import argparse
+import threading
+import subprocess
+
+default_mounts = ("/hdfs_mount",)
+default_fix_command = "sudo fusermount -uz {mount}; sleep 1; sudo mount {mount}"
+
+
+def configured_mounts(mounts=None):
+    """ Mount points to watch: given ones, or FUSE_MOUNTS environment variable, or default_mounts """
+    if mounts:
+        return list(mounts)
+    return [m for m in os.environ.get("FUSE_MOUNTS", "").split(":") if m] or list(default_mounts)
+
+
+def log(message: str):
+    print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {message}", flush=True)
+
+
+def read_mountinfo(mountinfo: str = "/proc/self/mountinfo"):
+    """ {mount point: filesystem type} - reading mountinfo never touches the mounts, so it can't hang """
+
+    mounts = {}
+    with open(mountinfo) as f:
+        for line in f:
+            (fields, _, fs_fields) = line.partition(" - ")
+            fields = fields.split()
+            if len(fields) < 5 or not fs_fields:
+                continue
+            mount_point = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), fields[4])   # \040 is a space
+            mounts[mount_point] = fs_fields.split()[0]
+    return mounts
+
+
+def stat_probe(path: str):
+    os.stat(path)
+
+
+def statvfs_probe(path: str):
+    os.statvfs(path)
+
+
+default_probes = (stat_probe, statvfs_probe)
+
+
+class LatencyHistogram:
+    """
+    Counts of probe latencies in fixed buckets; percentiles are upper bounds of buckets.
+    A check that finds the mount hung counts how long it's been hung (at least the check's timeout).
+    """
+
+    bounds_ms = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, seconds: float):
+        ms = seconds * 1000
+        bucket = 0
+        while bucket < len(self.bounds_ms) and ms > self.bounds_ms[bucket]:
+            bucket += 1
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q: float):
+        if not self.count:
+            return None
+        seen = 0
+        for (bucket, count) in enumerate(self.counts):
+            seen += count
+            if seen >= self.count * q / 100:
+                return self.bounds_ms[bucket] if bucket < len(self.bounds_ms) else self.max_ms
+        return self.max_ms
+
+    def summary(self):
+        return dict(count=self.count, mean_ms=round(self.total_ms / self.count, 2) if self.count else None,
+                    p50_ms=self.percentile(50), p90_ms=self.percentile(90), p99_ms=self.percentile(99),
+                    max_ms=round(self.max_ms, 2))
+
+
+class Probe:
+    """ Probes of a mount, running in a daemon thread - a hung FUSE call can't be interrupted, only abandoned """
+
+    def __init__(self, path: str, probes):
+        self.path = path
+        self.started = time.monotonic()
+        self.elapsed = None
+        self.error = None
+        self.done = threading.Event()
+        threading.Thread(target=self.run, args=(probes,), daemon=True, name=f"probe {path}").start()
+
+    def run(self, probes):
+        try:
+            for probe in probes:
+                probe(self.path)
+        except Exception as e:      # not just OSError - a failing probe must never look like a hung one
+            self.error = e
+        finally:
+            self.elapsed = time.monotonic() - self.started
+            self.done.set()
+
+
+class MountState:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.histogram = LatencyHistogram()
+        self.probe = None
+        self.abandoned = []     # probes still stuck after the mount was remediated
+        self.status = None
+        self.failures = 0       # failed checks in a row
+        self.fixes = 0          # fixes since the mount was last OK
+        self.next_fix_at = 0.0
+
+
+class FuseMonitor:
+    """
+    Checks mounts concurrently; a check's status is OK, UNMOUNTED, ERROR (probe raised, e.g. "Transport endpoint
+    is not connected" of a dead FUSE process) or HUNG (probe didn't finish in `timeout` seconds).
+    A new probe of a mount isn't started while the previous one is still hung, so hung mounts don't pile up threads.
+    A remediated mount gets a fresh probe (its hung one may never return), but only while fewer than
+    max_abandoned of its probes are still stuck.
+    Every check but an UNMOUNTED one adds a sample to the mount's latency histogram - a HUNG one the time
+    the mount has been hung, so a mount that keeps hanging shows in the percentiles, not as missing samples.
+
+    probes - callables of a path, raising an exception (OSError normally) on failure (tests inject slow or hung ones);
+    remediate(path, status) - called after failures_before_fix failed checks in a row, then no sooner
+    than after `backoff` seconds, doubling up to max_backoff, until the mount is OK again.
+    """
+
+    def __init__(self, mounts, probes=default_probes, timeout: float = 5.0, failures_before_fix: int = 3,
+                 backoff: float = 60.0, max_backoff: float = 3600.0, remediate=None,
+                 mountinfo: str = "/proc/self/mountinfo", check_mounted: bool = True, max_abandoned: int = 10):
+        self.mounts = [MountState(path) for path in mounts]
+        self.probes = probes
+        self.timeout = timeout
+        self.failures_before_fix = failures_before_fix
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.remediate = remediate
+        self.mountinfo = mountinfo
+        self.check_mounted = check_mounted
+        self.max_abandoned = max_abandoned
+
+    def check(self):
+        """ Checks all mounts at once, waiting at most `timeout` seconds in total. Returns {path: status} """
+
+        mounted = read_mountinfo(self.mountinfo) if self.check_mounted else None
+        started = []
+        for state in self.mounts:
+            state.abandoned = [probe for probe in state.abandoned if not probe.done.is_set()]
+            # normpath, not realpath - resolving the path would touch the (maybe hung) mount
+            if mounted is not None and os.path.normpath(os.path.abspath(state.path)) not in mounted:
+                state.status = "UNMOUNTED"
+            elif state.probe is not None and not state.probe.done.is_set():
+                state.status = "HUNG"       # still stuck in a previous check
+                state.histogram.add(time.monotonic() - state.probe.started)
+            elif len(state.abandoned) >= self.max_abandoned:
+                state.status = "HUNG"       # don't leave more threads stuck in this mount
+                state.histogram.add(time.monotonic() - state.abandoned[0].started)
+            else:
+                state.probe = Probe(state.path, self.probes)
+                started.append(state)
+
+        deadline = time.monotonic() + self.timeout
+        for state in started:
+            if not state.probe.done.wait(max(0.0, deadline - time.monotonic())):
+                state.status = "HUNG"
+                state.histogram.add(time.monotonic() - state.probe.started)
+                continue
+            state.status = "ERROR" if state.probe.error is not None else "OK"
+            state.histogram.add(state.probe.elapsed)
+        return {state.path: state.status for state in self.mounts}
+
+    def handle(self, state: MountState, now: float = None):
+        """ Counts failures of a checked mount and remediates it when it's due. Returns True if it was remediated """
+
+        now = time.monotonic() if now is None else now
+        if state.status == "OK":
+            if state.failures:
+                log(f"{state.path} is OK again after {state.failures} failed checks")
+            (state.failures, state.fixes, state.next_fix_at) = (0, 0, 0.0)
+            return False
+
+        state.failures += 1
+        detail = ""
+        if state.status == "HUNG" and state.probe is not None:
+            detail = f" for {time.monotonic() - state.probe.started:.1f}s"
+        elif state.status == "HUNG":
+            detail = f", {len(state.abandoned)} probes abandoned by remediation are still stuck"
+        elif state.status == "ERROR":
+            detail = f": {state.probe.error}"
+        log(f"{state.path} is {state.status}{detail} ({state.failures} failed checks in a row)")
+
+        if self.remediate is None or state.failures < self.failures_before_fix or now < state.next_fix_at:
+            return False
+        log(f"Remediating {state.path}")
+        self.remediate(state.path, state.status)
+        if state.probe is not None and not state.probe.done.is_set():
+            state.abandoned.append(state.probe)     # next check probes the remediated mount afresh
+        state.probe = None
+        state.fixes += 1
+        state.next_fix_at = now + min(self.backoff * 2 ** (state.fixes - 1), self.max_backoff)
+        return True
+
+    def check_and_handle(self):
+        statuses = self.check()
+        for state in self.mounts:
+            self.handle(state)
+        return statuses
+
+    def report(self):
+        """ {path: status and latency histogram summary} """
+        return {state.path: dict(status=state.status, failures=state.failures, fixes=state.fixes,
+                                 **state.histogram.summary())
+                for state in self.mounts}
+
+    def run(self, interval: float = 10.0, report_interval: float = 300.0, stop: threading.Event = None):
+        """ Checks mounts every `interval` seconds until `stop` is set """
+
+        stop = stop or threading.Event()
+        next_report = time.monotonic() + report_interval
+        while True:
+            started = time.monotonic()
+            self.check_and_handle()
+            if started >= next_report:
+                log("Latencies: " + json.dumps(self.report()))
+                next_report = started + report_interval
+            if stop.wait(max(0.0, interval - (time.monotonic() - started))):
+                break
+
+
+def fix_command_remediation(command: str = default_fix_command, mail_to: str = None, timeout: float = 120):
+    """
+    remediate() that runs a shell command ({mount} is the mount point, shell-quoted), optionally mailing its output
+    """
+
+    def remediate(path: str, status: str):
+        text = f"Bouncing fuse mount {path} ({status})\n"
+        try:
+            result = subprocess.run(command.format(mount=shlex.quote(path)), shell=True, stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT, timeout=timeout, universal_newlines=True)
+            text += result.stdout + f"exit code {result.returncode}\n"
+        except subprocess.TimeoutExpired:
+            text += f"fix command timed out after {timeout}s\n"
+        log(text.rstrip())
+        if mail_to:
+            subprocess.run(["mailx", "-s", f"Fuse mount {path} bounced on {os.uname().nodename}", mail_to],
+                           input=text, universal_newlines=True)
+
+    return remediate
+
+
+if __name__ == '__main__':
+
+    args_parser = argparse.ArgumentParser(description="Health monitor of FUSE mounts")
+    args_parser.add_argument("mounts", metavar="mount_point", nargs="*",
+                             help="mount points (default: FUSE_MOUNTS environment variable, or /hdfs_mount)")
+    args_parser.add_argument("--interval", metavar="seconds", type=float, default=10.0,
+                             help="check mounts every so many seconds (default: 10)")
+    args_parser.add_argument("--timeout", metavar="seconds", type=float, default=5.0,
+                             help="a mount is HUNG if probes don't finish in so many seconds (default: 5)")
+    args_parser.add_argument("--failures-before-fix", metavar="N", type=int, default=3,
+                             help="remediate a mount after N failed checks in a row (default: 3)")
+    args_parser.add_argument("--backoff", metavar="seconds", type=float, default=60.0,
+                             help="wait before fixing the same mount again, doubled after each fix (default: 60)")
+    args_parser.add_argument("--max-backoff", metavar="seconds", type=float, default=3600.0,
+                             help="longest wait between fixes of a mount (default: 3600)")
+    args_parser.add_argument("--fix-command", default=default_fix_command,
+                             help=f"shell command that remediates {{mount}} (default: {default_fix_command})")
+    args_parser.add_argument("--no-fix", action="store_true", help="only report, never remediate")
+    args_parser.add_argument("--mail-to", metavar="address", help="mail output of fix command with mailx")
+    args_parser.add_argument("--no-mount-check", action="store_true",
+                             help="don't require mount points to be in /proc/self/mountinfo (e.g. local directories)")
+    args_parser.add_argument("--report-interval", metavar="seconds", type=float, default=300.0,
+                             help="log latency histograms every so many seconds (default: 300)")
+    args_parser.add_argument("--once", action="store_true",
+                             help="check once, fix failed mounts and exit with 1 if any failed")
+    args = args_parser.parse_args()
+
+    remediate = None if args.no_fix else fix_command_remediation(args.fix_command, args.mail_to)
+    monitor = FuseMonitor(configured_mounts(args.mounts), timeout=args.timeout,
+                          failures_before_fix=1 if args.once else args.failures_before_fix,
+                          backoff=args.backoff, max_backoff=args.max_backoff, remediate=remediate,
+                          check_mounted=not args.no_mount_check)
+
+    if args.once:
+        statuses = monitor.check_and_handle()
+        sys.exit(0 if all(status == "OK" for status in statuses.values()) else 1)
+
+    try:
+        monitor.run(args.interval, args.report_interval)
+    except KeyboardInterrupt:
+        log("Latencies: " + json.dumps(monitor.report()))
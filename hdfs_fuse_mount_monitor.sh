@@ -49,4 +49,4 @@ exit 0
 ## TODO: 
 ## 1. the script assumes HDFS fuse mount is mounted, but could be hanging;
 ##    improve by checking if the mount isn't mounted at all.
-
+##    fuse_monitor.py does that (and watches several mounts concurrently, with cheaper stat/statvfs probes).
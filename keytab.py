@@ -1,6 +1,6 @@
 #!python
 
-from getpass import getuser, getpass
+from getpass import getuser
 
 default_keytab = '/home/%s/.kt' % getuser()
 default_domain = 'CORP.EPSILON.COM'
@@ -9,23 +9,42 @@ ktutil = '/usr/bin/ktutil'
 __doc__ = """Keytab file maintenance utility.
 
 Usage:
+    keytab.py list [--keytab=filename]
+    keytab.py merge <keytabs>... [--keytab=filename]
+    keytab.py prune [--keytab=filename] [--principal=name] [--domain=realm]
+                                         [--drop-kvno=entry] [--drop-algorithms=list] [--keep-kvnos=N]
     keytab.py [-u | --update] <username> [--domain=realm] [--keytab=filename]
                                          [--and-test] [--algorithms=list] [--kvno=entry]
                                          [-d | --debug]
     keytab.py test <username> [--domain=realm] [--keytab=filename]
+    keytab.py batch [<file>] [--domain=realm] [--keytab-dir=directory] [--sessions=N]
+                                         [--algorithms=list] [--kvno=entry] [-u | --update] [--ktutil=command]
     keytab.py (-h | --help)
 
 Commands:
     (default)       Creates/overwrites Keytab file
     test            Use generated keytab with kinit to test creating Kerberos ticket.
+    batch           Creates/updates keytabs for many principals, read from <file> (or stdin) as lines
+                        principal<TAB>password[<TAB>keytab]
+                    (principal without @realm is in --domain, keytab defaults to --keytab-dir/<principal>.keytab).
+                    ktutil sessions are reused for many principals; prints result of each principal.
+                    Principals of the same keytab all go into it (without -u, replacing its old entries).
+    list            Lists entries of keytab (like klist -ket, without Kerberos libraries)
+    merge           Adds entries of <keytabs> to keytab; entries of the same principal, KVNO and algorithm
+                    are replaced by the last keytab's ones.
+    prune           Removes --principal's (or all principals') entries with --drop-kvno, or --drop-algorithms,
+                    or not in principal's --keep-kvnos highest KVNOs; just --principal removes all its entries.
+                    Also removes duplicate entries - prune with no options compacts keytab.
 
 Arguments:
     <username>      Is your Windows / Active Directory login name
                     (and not UNIX login, in case if it's different from AD login).
+    <file>          Batch input file, - or no file is stdin
+    <keytabs>       Keytab files to merge into --keytab
 
 Options:
     -h --help            Show this screen
-    --update             Overwrites just --kvno keytab entry and leaves other entries the same.
+    -u --update          Overwrites just --kvno keytab entry and leaves other entries the same.
     --domain=realm       Kerberos domain / AD realm [default: %s]
     --keytab=filename    Keytab location [default: %s]
     --and-test           After keytab is created/updated, try to use it by creating a Kerberos ticket
@@ -34,41 +53,222 @@ Options:
                          The list has to be comma-separated [default: rc4-hmac,aes256-cts]
     --kvno=entry         Key entry in keytab, passed as -k kvno argument to
                          ktutil's addent command [default: 1]
+    --keytab-dir=dir     Directory of batch keytabs that input doesn't give a location for [default: .]
+    --sessions=N         Number of ktutil sessions batch runs in parallel [default: 1]
+    --ktutil=command     ktutil command, e.g. "python ./fake_ktutil.py" for testing [default: %s]
+    --principal=name     Principal which entries prune removes (without @realm - in --domain)
+    --drop-kvno=entry    KVNO of entries prune removes
+    --drop-algorithms=list  Comma-separated algorithms of entries prune removes
+    --keep-kvnos=N       Number of highest KVNOs of each principal that prune keeps
 
 Assumptions:
 1.    This script expects MIT Kerberos compatible ktutil command
       to be available as %s.
       Script is known not to work with Heimdal Kerberos compatible ktutil.
+      ktutil only derives keys; keytab files are read and written in MIT format (0x502) by this script,
+      new keytab replaces the old one atomically.
 2.    docopt, pexpect Python modules should be available.
 
 History:
     01/16/2017  rdautkhanov@epsilon.com - 1.0   Initial version
 """ % \
-          (default_domain, default_keytab, ktutil)
+          (default_domain, default_keytab, ktutil, ktutil)
 
 
 ###################################################################################################
 ###################################################################################################
 
 
-try:
-    import pexpect
-    from docopt import docopt
-except ImportError:
-    exit('Not found doctopt or pexpect Python module. Both are required')
+import os
 import sys
+import errno
+import struct
+from collections import namedtuple
+
+# pexpect and docopt are imported where they're used - importing keytab stays cheap
+
+default_prompt = 'ktutil:  '
+default_algorithms = ('rc4-hmac', 'aes256-cts')
+
+
+class KeytabError(Exception):
+    """ ktutil failed to read, create or write the keytab """
+
+
+###################################################################################################
+# MIT keytab file format (version 0x502) - read, merge, prune and write keytabs without ktutil.
+# ktutil is still needed to derive keys from a password (addent).
+
+KeytabEntry = namedtuple('KeytabEntry', 'principal kvno enctype key timestamp name_type')
+
+keytab_version = b'\x05\x02'
+
+enctype_names = {
+    1: 'des-cbc-crc', 3: 'des-cbc-md5', 16: 'des3-cbc-sha1', 17: 'aes128-cts-hmac-sha1-96',
+    18: 'aes256-cts-hmac-sha1-96', 19: 'aes128-cts-hmac-sha256-128', 20: 'aes256-cts-hmac-sha384-192',
+    23: 'arcfour-hmac', 24: 'arcfour-hmac-exp', 25: 'camellia128-cts-cmac', 26: 'camellia256-cts-cmac',
+}
+enctype_numbers = dict((name, number) for (number, name) in enctype_names.items())
+enctype_numbers.update({'aes128-cts': 17, 'aes256-cts': 18, 'rc4-hmac': 23, 'arcfour-hmac-md5': 23})
+
+
+def enctype_number (enctype):
+    """ Enctype number of an enctype name as ktutil knows them (e.g. rc4-hmac), or of a number """
+    if str(enctype).isdigit():
+        return int(enctype)
+    try:
+        return enctype_numbers[enctype.lower()]
+    except KeyError:
+        raise KeytabError('Unknown encryption type %s' % enctype)
+
+
+def _counted (data):
+    return struct.pack('>H', len(data)) + data
+
+
+def pack_entry (entry):
+    """ Keytab record of KeytabEntry, with its length prefix """
+
+    (name, realm) = entry.principal.rsplit('@', 1)
+    components = name.split('/')
+    record = (struct.pack('>H', len(components)) + _counted(realm.encode('utf-8'))
+              + b''.join(_counted(c.encode('utf-8')) for c in components)
+              + struct.pack('>IIBH', entry.name_type, entry.timestamp, entry.kvno & 0xff, entry.enctype)
+              + _counted(entry.key) + struct.pack('>I', entry.kvno))
+    return struct.pack('>i', len(record)) + record
+
+
+def parse_keytab (data):
+    """ List of KeytabEntry in keytab file contents, in file order. Raises KeytabError if it's not a keytab """
+
+    if data[:2] != keytab_version:
+        raise KeytabError('Unsupported key table format version number')
+
+    entries = []
+    pos = 2
+    try:
+        while pos + 4 <= len(data):
+            (size,) = struct.unpack_from('>i', data, pos)
+            pos += 4
+            if size <= 0:
+                pos -= size         # a hole left by a deleted entry
+                continue
+            record = data[pos:pos + size]
+            pos += size
+
+            (count,) = struct.unpack_from('>H', record, 0)
+            at = 2
+            strings = []
+            for _ in range(count + 1):          # realm, then principal's components
+                (length,) = struct.unpack_from('>H', record, at)
+                strings.append(record[at + 2:at + 2 + length].decode('utf-8'))
+                at += 2 + length
+            (name_type, timestamp, kvno, enctype, length) = struct.unpack_from('>IIBHH', record, at)
+            at += 13
+            key = record[at:at + length]
+            at += length
+            if at + 4 <= len(record):
+                kvno = struct.unpack_from('>I', record, at)[0] or kvno       # 32-bit kvno, if it's there
+            entries.append(KeytabEntry('/'.join(strings[1:]) + '@' + strings[0], kvno, enctype, key,
+                                       timestamp, name_type))
+    except (struct.error, UnicodeDecodeError) as e:
+        raise KeytabError('Corrupt keytab entry at offset %d: %s' % (pos, e))
+    return entries
+
+
+def read_keytab (keytab):
+    """ List of KeytabEntry of keytab file """
+    with open(keytab, 'rb') as f:
+        data = f.read()
+    try:
+        return parse_keytab(data)
+    except KeytabError as e:
+        raise KeytabError('%s: %s' % (keytab, e))
+
+
+def write_keytab (keytab, entries):
+    """ Atomically replaces keytab file with entries - readers see either the old or the new keytab """
+
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(keytab))
+    (fd, tmp_file) = tempfile.mkstemp(dir=directory, prefix='.%s.' % os.path.basename(keytab))   # mode 0600
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(keytab_version + b''.join(pack_entry(entry) for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(keytab):
+            os.chmod(tmp_file, os.stat(keytab).st_mode & 0o7777)
+        os.rename(tmp_file, keytab)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+
+
+def dedup_entries (entries):
+    """ Leaves just the last entry of each principal, kvno and enctype, in order of entries """
+
+    last = dict(((e.principal, e.kvno, e.enctype), i) for (i, e) in enumerate(entries))
+    return [e for (i, e) in enumerate(entries) if last[(e.principal, e.kvno, e.enctype)] == i]
+
+
+def merge_entries (entries, new_entries, replace_kvnos=False):
+    """
+    Adds new_entries to entries, new ones replace existing entries of the same principal, kvno and enctype.
+    With replace_kvnos=True, all existing entries of principal's kvno are replaced (the --update behaviour).
+    """
+
+    if replace_kvnos:
+        replaced = set((e.principal, e.kvno) for e in new_entries)
+        entries = [e for e in entries if (e.principal, e.kvno) not in replaced]
+    return dedup_entries(list(entries) + list(new_entries))
+
+
+def prune_entries (entries, principal=None, kvno=None, enctypes=None, keep_kvnos=None):
+    """
+    Removes entries of principal (of all principals if None) that have kvno, or one of enctypes,
+    or aren't in principal's keep_kvnos highest kvnos. With no criteria but principal, removes all its entries.
+    Removes duplicate entries too.
+    """
 
+    enctypes = set(enctype_number(e) for e in enctypes or ())
+    kept = {}
+    if keep_kvnos is not None:
+        for e in entries:
+            kept.setdefault(e.principal, set()).add(e.kvno)
+        kept = dict((p, set(sorted(kvnos, reverse=True)[:keep_kvnos])) for (p, kvnos) in kept.items())
 
-# Parse command-line arguments
-args = docopt(__doc__)
+    def pruned (e):
+        if principal is not None and e.principal != principal:
+            return False
+        if kvno is None and not enctypes and keep_kvnos is None:
+            return principal is not None
+        return e.kvno == kvno or e.enctype in enctypes or (keep_kvnos is not None and e.kvno not in kept[e.principal])
 
-Debug = args['--debug']
-keytab = args['--keytab']
-principal = args['<username>'] +'@'+ args['--domain']
+    return dedup_entries([e for e in entries if not pruned(e)])
 
-if Debug: print(args)
 
-def kinit_test ():
+def install_keytab (new_keytab, keytab, update=False):
+    """
+    Moves entries of (ktutil-written) new_keytab to keytab. With update=True, merges them into existing
+    keytab replacing entries of the same principal and kvno; otherwise keytab is replaced.
+    Returns False if update=True, but keytab didn't exist and a new one was created.
+    """
+
+    entries = []
+    existed = True
+    if update:
+        try:
+            entries = read_keytab(keytab)
+        except (IOError, OSError) as e:
+            if e.errno != errno.ENOENT:
+                raise
+            existed = False
+    write_keytab(keytab, merge_entries(entries, read_keytab(new_keytab), replace_kvnos=True))
+    return existed
+
+
+def kinit_test (principal, keytab=default_keytab):
     """
     Runs kinit to create a Kerberos ticket using (just) generated keytab file.
     Returns kinit's return code (0 == OK)
@@ -82,17 +282,11 @@ def kinit_test ():
         print("kinit wasn't able to create Kerberos ticket using this keytab.")
     return retcode
 
-if args['test']:
-    sys.exit(kinit_test())
-
 
-# 0. Start ktutil command as a child process
-child = pexpect.spawn(ktutil)
-default_prompt = 'ktutil:  '
-
-def wait (prompt=default_prompt):
+def wait (child, prompt=default_prompt):
     ''' Wait for ktutil's prompt
-        Returns true if ktutil's cli command  produced output (error message) or unexpected prompt
+        Returns ktutil's error message if its cli command produced output (error message) or unexpected prompt,
+        None if it's all good
     '''
 
     # always wait for default prompt too in case of error, so no timeout exception
@@ -103,61 +297,354 @@ def wait (prompt=default_prompt):
                 or  (i == 1)       # or ktutil gives default prompt when another prompt expected
               )
     if problem:
-        print('ktutil error: ' + lines[1])
-    return problem
-
-# wait for ktutil to show its first prompt
-wait()
-if Debug:
-    child.logfile = sys.stdout
-    print('Spawned ktutil successfully.')
-
-# 1. if it's an update, then read in keytab first
-wkt_action = 'save'
-if args['--update']:
-    wkt_action = 'update'
-    child.sendline('read_kt ' + keytab)
-    if wait():
-        print("Couldn't read keytab file %s\nNew file will be created instead" % keytab)
-    # TODO: if KVNO already exists, ktutil may duplicate records in that entry
-else:
-    # else - try removing existing keytab
-    from os import remove
+        return lines[1] if len(lines) > 1 else 'unexpected prompt %r' % child.after
+
+
+def create_keytab (principal, password, keytab=default_keytab, algorithms=default_algorithms, kvno=1,
+                   update=False, debug=False, ktutil=ktutil):
+    """
+    Creates (or with update=True, updates `kvno` entry of) keytab file with keys of principal's password,
+    one key for each algorithm. Raises KeytabError if ktutil fails.
+    Returns 'save' or 'update' - what was done.
+    ktutil only derives the keys into a new keytab in a private temporary directory;
+    existing keytab is then merged (if update) and replaced atomically by install_keytab.
+    """
+
+    import pexpect
+    import tempfile
+
+    # 0. Start ktutil command as a child process
+    try:
+        child = pexpect.spawn(ktutil, encoding='utf-8')
+    except pexpect.ExceptionPexpect as e:
+        raise KeytabError(str(e))
+    tmp_dir = tempfile.mkdtemp(prefix='keytab-')     # mode 0700 - keys don't leak before they're installed
+    new_keytab = os.path.join(tmp_dir, 'new.keytab')
+    try:
+        # wait for ktutil to show its first prompt
+        error = wait(child)
+        if error:
+            raise KeytabError('ktutil error: ' + error)
+        if debug:
+            child.logfile = sys.stdout
+            print('Spawned ktutil successfully.')
+
+        # 1. For each algorithm, call ktutil's addent command
+        for algorithm in algorithms:
+
+            child.sendline('addent -password -p %s -k %s -e %s'
+                                % (principal, kvno, algorithm)
+                          )
+            error = wait(child, 'Password for ' + principal)
+            if error:
+                raise KeytabError('Unexpected ktutil error while waiting for password prompt: ' + error)
+
+            child.sendline(password)
+            error = wait(child)
+            if error:
+                raise KeytabError('Unexpected ktutil error after addent command: ' + error)
+
+        # 2. Save new keys to a temporary keytab
+        child.sendline('write_kt ' + new_keytab)
+        error = wait(child)
+        if error:
+            raise KeytabError("Couldn't write keytab file %s: %s" % (new_keytab, error))
+
+        # 3. exit from ktutil
+        child.sendline('quit')
+        child.close()
+
+        # 4. Merge new keys into existing keytab (replacing its `kvno` entry) or replace it
+        try:
+            if not install_keytab(new_keytab, keytab, update):
+                print("Couldn't read keytab file %s\nNew file was created instead" % keytab)
+        except (IOError, OSError) as e:
+            raise KeytabError("Couldn't write keytab file %s: %s" % (keytab, e))
+        if debug:
+            print('Keytab %s %s with %d entries.' % (keytab, 'updated' if update else 'saved',
+                                                       len(read_keytab(keytab))))
+    finally:
+        child.close()           # termintate ktutil (if it's not closed already)
+        if os.path.exists(new_keytab):
+            os.remove(new_keytab)
+        os.rmdir(tmp_dir)
+
+    return 'update' if update else 'save'
+
+
+class KtutilSession:
+    """
+    One ktutil process that creates keytabs for many principals.
+
+    Commands of a principal are pipelined - only password prompts are waited for, then a request that
+    ktutil doesn't know (a marker) is sent, and everything ktutil printed before its "Unknown request" message
+    is checked for errors at once. Type-ahead input is safe as ktutil turns echo off without flushing input.
+    """
+
+    def __init__ (self, ktutil=ktutil, timeout=10, lock=None):
+        import pexpect
+        import threading
+        self.pexpect = pexpect
+        self.requests = 0
+        self.lock = lock or threading.Lock()        # serializes installs of sessions that may share a keytab
+        self.tmp_dir = None
+        try:
+            self.child = pexpect.spawn(ktutil, encoding='utf-8', timeout=timeout)
+        except pexpect.ExceptionPexpect as e:
+            raise KeytabError(str(e))
+        self.child.delaybeforesend = None       # pexpect's default 50ms pause before every line
+        self.expect(default_prompt)
+
+    def expect (self, pattern):
+        """ Waits for exact text, returns what ktutil printed before it """
+        try:
+            self.child.expect_exact(pattern)
+        except (self.pexpect.TIMEOUT, self.pexpect.EOF) as e:
+            self.close()
+            raise KeytabError('ktutil session failed waiting for %r: %s' % (pattern, type(e).__name__))
+        return self.child.before
+
+    def create (self, principal, password, keytab, algorithms=default_algorithms, kvno=1, update=False):
+        """
+        Creates keytab (or with update=True, replaces `kvno` entries in it). Returns None if it's all good,
+        otherwise error messages. Raises KeytabError if ktutil session is unusable.
+        ktutil writes the keys to a new temporary keytab, that install_keytab moves to keytab.
+        """
+
+        if self.tmp_dir is None:
+            import tempfile
+            self.tmp_dir = tempfile.mkdtemp(prefix='keytab-')
+        self.requests += 1
+        marker = 'end-of-request-%d' % self.requests
+        new_keytab = os.path.join(self.tmp_dir, '%d.keytab' % self.requests)
+        sent = ['clear_list']
+        self.child.sendline(sent[0])
+
+        try:
+            output = []
+            for algorithm in algorithms:
+                command = 'addent -password -p %s -k %s -e %s' % (principal, kvno, algorithm)
+                sent.append(command)
+                self.child.sendline(command)
+                output.append(self.expect('Password for %s:' % principal))
+                self.child.sendline(password)
+
+            for command in ('write_kt ' + new_keytab, marker):
+                sent.append(command)
+                self.child.sendline(command)
+            output.append(self.expect('Unknown request "%s"' % marker))
+            self.expect(default_prompt)     # rest of the "Unknown request" message
+
+            output = ''.join(output)
+            for command in sent:        # terminal's echo of type-ahead commands can land mid-line
+                output = output.replace(command, '')
+            errors = []
+            for line in output.splitlines():
+                line = line.strip()
+                while line.startswith(default_prompt.strip()):          # prompts, maybe several in a row
+                    line = line[len(default_prompt.strip()):].strip()
+                if line:
+                    errors.append(line)
+            if errors:
+                return '; '.join(errors)
+
+            try:
+                with self.lock:
+                    install_keytab(new_keytab, keytab, update)
+            except (IOError, OSError, KeytabError) as e:
+                return "Couldn't write keytab file %s: %s" % (keytab, e)
+        finally:
+            if os.path.exists(new_keytab):
+                os.remove(new_keytab)
+
+    def close (self):
+        if self.child.isalive():
+            self.child.sendline('quit')
+        self.child.close()
+        if self.tmp_dir and os.path.isdir(self.tmp_dir):
+            import shutil
+            shutil.rmtree(self.tmp_dir)
+
+
+def read_batch (lines, domain=default_domain, keytab_dir='.'):
+    """ (principal, password, keytab) for each `principal<TAB>password[<TAB>keytab]` line """
+
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip() or line.startswith('#'):
+            continue
+        fields = line.split('\t')
+        if len(fields) < 2:
+            raise ValueError('Expected principal<TAB>password[<TAB>keytab], got: %s' % fields[0])
+        principal = fields[0].strip()
+        if '@' not in principal:
+            principal += '@' + domain
+        keytab = fields[2].strip() if len(fields) > 2 and fields[2].strip() else \
+                    os.path.join(keytab_dir, principal.split('@')[0].replace('/', '_') + '.keytab')
+        yield principal, fields[1], keytab
+
+
+def create_keytabs (requests, sessions=1, algorithms=default_algorithms, kvno=1, update=False, ktutil=ktutil):
+    """
+    Creates keytabs for (principal, password, keytab) requests with `sessions` ktutil sessions in parallel.
+    Returns list of (principal, keytab, None or error message), in order of requests.
+    Requests of the same keytab are done in order by one session: without update, the first one replaces
+    the keytab and the rest are merged into it, so principals sharing a keytab don't overwrite each other.
+    """
+
+    import threading
+    from multiprocessing.pool import ThreadPool
+
+    local = threading.local()
+    lock = threading.Lock()
+    opened = []
+
+    def create (request, update):
+        (principal, password, keytab) = request
+        try:
+            session = getattr(local, 'session', None)
+            if session is None or not session.child.isalive():
+                session = local.session = KtutilSession(ktutil, lock=lock)
+                opened.append(session)
+            return principal, keytab, session.create(principal, password, keytab, algorithms, kvno, update)
+        except KeytabError as e:
+            local.session = None        # next request of this thread starts a new session
+            return principal, keytab, str(e)
+
+    def create_group (group):
+        return [(i, create(request, update or n > 0)) for n, (i, request) in enumerate(group)]
+
+    groups = {}
+    for i, request in enumerate(requests):
+        groups.setdefault(os.path.abspath(request[2]), []).append((i, request))
+
+    pool = ThreadPool(sessions)
     try:
-        remove(keytab)
-        if Debug:
-            print('Existing keytab %s removed.' % keytab)
-    except OSError:
-        pass        # assuming e.errno==ENOENT  - file doesn't exist
+        results = pool.map(create_group, sorted(groups.values()), chunksize=1)
+        return [result for (i, result) in sorted(sum(results, []))]
+    finally:
+        pool.close()
+        pool.join()
+        for session in opened:
+            session.close()
 
-# 2. Prompt user for Principal's password
-password = getpass('Active Directory user %s password: ' % principal)
 
-# 3. For each algorithm, call ktutil's addent command
-for algorithm in args['--algorithms'].split(','):
+def main (args):
 
-    child.sendline('addent -password -p %s -k %s -e %s'
-                        % (principal, args['--kvno'], algorithm)
-                  )
-    if wait('Password for ' + principal):
-        exit('Unexpected ktutil error while waiting for password prompt')
+    debug = args['--debug']
+    keytab = args['--keytab']
+    principal = (args['<username>'] or '') +'@'+ args['--domain']
 
-    child.sendline(password)
-    if wait():
-        exit('Unexpected ktutil error after addent command')
+    if debug: print(args)
 
-# 4. Now we can save keytab file
-child.sendline('write_kt ' + keytab)
-if wait():
-    exit("Couldn't write keytab file " + keytab)
-print("Keytab file %s %sd." % (keytab, wkt_action))
+    if args['test']:
+        return kinit_test(principal, keytab)
 
-# 5. exit from ktutil
-child.sendline('quit')
-child.close()           # termintate ktutil (if it's not closed already)
+    if args['batch']:
+        return main_batch(args)
 
-# 6. Optionally test newly created/update keytab
-if args['--and-test']:
-    kinit_test()
+    if args['list'] or args['merge'] or args['prune']:
+        try:
+            return main_keytab_file(args)
+        except (IOError, OSError, KeytabError) as e:
+            return str(e)
+
+    # Prompt user for Principal's password
+    from getpass import getpass
+    password = getpass('Active Directory user %s password: ' % principal)
+
+    try:
+        wkt_action = create_keytab(principal, password, keytab, args['--algorithms'].split(','), args['--kvno'],
+                                   args['--update'], debug, args['--ktutil'])
+    except ImportError:
+        return 'Not found pexpect Python module. It is required'
+    except KeytabError as e:
+        return str(e)
+    print("Keytab file %s %sd." % (keytab, wkt_action))
 
+    # Optionally test newly created/update keytab
+    if args['--and-test']:
+        kinit_test(principal, keytab)
+
+    return 0
+
+
+def main_batch (args):
+
+    source = args['<file>']
+    f = sys.stdin if source in (None, '-') else open(source)
+    try:
+        requests = list(read_batch(f, args['--domain'], args['--keytab-dir']))
+    except ValueError as e:
+        return str(e)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+    try:
+        results = create_keytabs(requests, int(args['--sessions']), args['--algorithms'].split(','),
+                                 args['--kvno'], args['--update'], args['--ktutil'])
+    except ImportError:
+        return 'Not found pexpect Python module. It is required'
+
+    failed = 0
+    for (principal, keytab, error) in results:
+        if error:
+            failed += 1
+            print('FAILED\t%s\t%s' % (principal, error))
+        else:
+            print('OK\t%s\t%s' % (principal, keytab))
+    print('%d principals: %d ok, %d failed' % (len(results), len(results) - failed, failed))
+    return 1 if failed else 0
+
+
+def main_keytab_file (args):
+    """ list, merge and prune commands - done on the keytab file itself, without ktutil """
+
+    keytab = args['--keytab']
+
+    if args['list']:
+        import time
+        entries = read_keytab(keytab)
+        print('Keytab name: FILE:%s' % keytab)
+        print('KVNO Timestamp           Principal')
+        print('---- ------------------- ' + '-' * 54)
+        for e in entries:
+            print('%4d %s %s (%s)' % (e.kvno, time.strftime('%m/%d/%Y %H:%M:%S', time.localtime(e.timestamp)),
+                                     e.principal, enctype_names.get(e.enctype, 'etype %d' % e.enctype)))
+        return 0
+
+    try:
+        entries = read_keytab(keytab)
+    except (IOError, OSError) as e:
+        if not (args['merge'] and e.errno == errno.ENOENT):
+            raise
+        entries = []            # merge into a new keytab
+    before = len(entries)
+
+    if args['merge']:
+        for source in args['<keytabs>']:
+            entries = merge_entries(entries, read_keytab(source))
+    else:
+        principal = args['--principal']
+        if principal and '@' not in principal:
+            principal += '@' + args['--domain']
+        entries = prune_entries(entries, principal,
+                                int(args['--drop-kvno']) if args['--drop-kvno'] else None,
+                                args['--drop-algorithms'].split(',') if args['--drop-algorithms'] else None,
+                                int(args['--keep-kvnos']) if args['--keep-kvnos'] else None)
+
+    write_keytab(keytab, entries)
+    print('Keytab file %s: %d entries, was %d.' % (keytab, len(entries), before))
+    return 0
+
+
+if __name__ == '__main__':
+
+    try:
+        from docopt import docopt
+    except ImportError:
+        sys.exit('Not found doctopt Python module. It is required')
 
+    # Parse command-line arguments
+    sys.exit(main(docopt(__doc__)))
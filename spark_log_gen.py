@@ -0,0 +1,138 @@
+#!python
+
+# Synthetic Spark driver log generator - test data for dbus.py and dbus_bench.py
+#
+# Usage:
+#   python ./spark_log_gen.py <output_log4j.txt> [--size=100MB] [--lines-per-second=50]
+#                            [--events-per-hour=60] [--churn=0.3] [--max-executors=50] [--seed=1]
+#
+# Output name ending with .gz, .bz2 or .xz writes a compressed log.
+
+import os
+import random
+import argparse
+from time import mktime, localtime, strftime
+
+import dbus
+
+
+app_id = "app-20190310100000-0001"
+
+noise_templates = [
+    "INFO TaskSetManager: Starting task {n}.0 in stage {stage}.0 (TID {tid}, 10.0.{host}.{ip}, executor {executor}, "
+    "partition {n}, PROCESS_LOCAL, 8294 bytes)",
+    "INFO TaskSetManager: Finished task {n}.0 in stage {stage}.0 (TID {tid}) in {ms} ms on 10.0.{host}.{ip} "
+    "(executor {executor}) ({n}/2000)",
+    "INFO BlockManagerInfo: Added broadcast_{stage}_piece0 in memory on 10.0.{host}.{ip}:4{ip:04d} "
+    "(size: 31.2 KB, free: 5.2 GB)",
+    "INFO DAGScheduler: Submitting {n} missing tasks from ShuffleMapStage {stage} (MapPartitionsRDD[{tid}] "
+    "at save at NativeMethodAccessorImpl.java:0)",
+    "INFO ContextCleaner: Cleaned accumulator {tid}",
+    "INFO MapOutputTrackerMasterEndpoint: Asked to send map output locations for shuffle {stage} "
+    "to 10.0.{host}.{ip}:4{ip:04d}",
+    "WARN TaskSetManager: Lost task {n}.0 in stage {stage}.0 (TID {tid}, 10.0.{host}.{ip}, executor {executor}): "
+    "FetchFailed(BlockManagerId({executor}, 10.0.{host}.{ip}, 4{ip:04d}, None), shuffleId={stage})",
+]
+
+stack_trace = [
+    "org.apache.spark.shuffle.FetchFailedException: Failed to connect to 10.0.{host}.{ip}:4{ip:04d}",
+    "\tat org.apache.spark.storage.ShuffleBlockFetcherIterator.throwFetchFailedException("
+    "ShuffleBlockFetcherIterator.scala:554)",
+    "\tat org.apache.spark.storage.ShuffleBlockFetcherIterator.next(ShuffleBlockFetcherIterator.scala:485)",
+    "\tat scala.collection.Iterator$$anon$12.nextCur(Iterator.scala:435)",
+]
+
+
+def parse_size(size: str):
+    """ '500KB', '100MB', '2GB' or plain bytes """
+    units = {"KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30}
+    size = size.upper()
+    return int(float(size[:-2]) * units[size[-2:]]) if size[-2:] in units else int(size)
+
+
+def open_output(filename: str):
+    opener = dbus.compressed_openers.get(os.path.splitext(filename)[1].lower(), open)
+    return opener(filename, "wb")
+
+
+def generate_log(filename: str, size: int = 100 << 20, lines_per_second: float = 50,
+                 events_per_hour: float = 60, churn: float = 0.3, max_executors: int = 50, seed: int = 1,
+                 start_ts: float = None):
+    """
+    Writes a log4j driver log of about `size` bytes.
+
+    `events_per_hour` - executor RUNNING/LOST events, `churn` - share of them that are LOST.
+    RUNNING events are preceded by a `Granted executor ID` line, as Spark does.
+    Returns (number of lines, number of executor events).
+    """
+
+    rnd = random.Random(seed)
+    ts = start_ts or mktime((2019, 3, 10, 10, 0, 0, 0, 0, -1))
+    event_probability = events_per_hour / 3600 / lines_per_second
+
+    running = []
+    next_executor = 0
+    (written, lines, events, tid) = (0, 0, 0, 0)
+
+    with open_output(filename) as f:
+        buffer = []
+
+        def write(line):
+            nonlocal written, lines
+            buffer.append(line)
+            written += len(line)
+            lines += 1
+
+        while written < size:
+            ts += rnd.expovariate(lines_per_second)
+            stamp = strftime("%y/%m/%d %H:%M:%S", localtime(ts))
+
+            if rnd.random() < event_probability:
+                if running and (rnd.random() < churn or len(running) >= max_executors):
+                    executor = running.pop(rnd.randrange(len(running)))
+                    write(f"{stamp} INFO StandaloneAppClient$ClientEndpoint: Executor updated: "
+                          f"{app_id}/{executor} is now LOST (worker lost)\n")
+                else:
+                    executor = next_executor
+                    next_executor += 1
+                    running.append(executor)
+                    write(f"{stamp} INFO StandaloneSchedulerBackend: Granted executor ID {app_id}/{executor} "
+                          f"on hostPort 10.0.{executor % 250}.{executor % 200}:4040 with 4 core(s), 8.0 GB RAM\n")
+                    write(f"{stamp} INFO StandaloneAppClient$ClientEndpoint: Executor updated: "
+                          f"{app_id}/{executor} is now RUNNING\n")
+                events += 1
+            else:
+                tid += 1
+                fields = dict(n=tid % 2000, stage=tid // 2000, tid=tid, ms=rnd.randrange(5, 5000),
+                              host=rnd.randrange(250), ip=rnd.randrange(200),
+                              executor=rnd.choice(running) if running else 0)
+                template = noise_templates[rnd.randrange(len(noise_templates))]
+                write(f"{stamp} {template.format(**fields)}\n")
+                if template.startswith("WARN") and rnd.random() < 0.1:
+                    for line in stack_trace:
+                        write(line.format(**fields) + "\n")
+
+            if len(buffer) >= 10000:
+                f.write("".join(buffer).encode())
+                buffer.clear()
+
+        f.write("".join(buffer).encode())
+
+    return lines, events
+
+
+if __name__ == '__main__':
+    args_parser = argparse.ArgumentParser(description="Generates a synthetic Spark log4j driver log")
+    args_parser.add_argument("filename", metavar="output_log4j.txt")
+    args_parser.add_argument("--size", default="100MB", help="approximate size, e.g. 500KB, 100MB, 2GB")
+    args_parser.add_argument("--lines-per-second", type=float, default=50)
+    args_parser.add_argument("--events-per-hour", type=float, default=60,
+                             help="executor RUNNING/LOST events per hour of log time")
+    args_parser.add_argument("--churn", type=float, default=0.3, help="share of executor events that are LOST")
+    args_parser.add_argument("--max-executors", type=int, default=50)
+    args_parser.add_argument("--seed", type=int, default=1)
+    args = args_parser.parse_args()
+
+    (line_count, event_count) = generate_log(args.filename, parse_size(args.size), args.lines_per_second, args.events_per_hour,
+                                             args.churn, args.max_executors, args.seed)
+    print(f"{args.filename}: {line_count:,} lines, {event_count:,} executor events")
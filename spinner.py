@@ -1,6 +1,7 @@
 
 
 import sys
+import time
 import threading
 import itertools
 
@@ -10,7 +11,7 @@ class Spinner:
     def __init__(self, message, delay=0.1):
         self.spinner = itertools.cycle(['-', '/', '|', '\\'])
         self.delay = delay
-        self.busy = False
+        self.stopped = threading.Event()
         self.spinner_visible = False
         sys.stdout.write(message)
 
@@ -32,29 +33,196 @@ class Spinner:
                 sys.stdout.flush()
 
     def spinner_task(self):
-        while self.busy:
+        while not self.stopped.is_set():
             self.write_next()
-            time.sleep(self.delay)
+            self.stopped.wait(self.delay)       # returns as soon as __exit__ sets it
             self.remove_spinner()
 
     def __enter__(self):
         if sys.stdout.isatty():
             self._screen_lock = threading.Lock()
-            self.busy = True
-            self.thread = threading.Thread(target=self.spinner_task)
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.spinner_task, daemon=True)
             self.thread.start()
+        return self
 
     def __exit__(self, exc_type, exc_val, exc_traceback):
         if sys.stdout.isatty():
-            self.busy = False
+            self.stopped.set()
+            self.thread.join()
             self.remove_spinner(cleanup=True)
         else:
             sys.stdout.write('\r')
 
 
 
+class Counter:
+    """ Counts of one writer (a thread) - bumped without a lock, as nobody else writes them """
+
+    __slots__ = ('items', 'bytes')
+
+    def __init__(self):
+        self.items = 0
+        self.bytes = 0
+
+
+class SharedCounter:
+    """ Counter of a pool worker process, kept in a slot of Progress' shared memory array """
+
+    __slots__ = ('array', 'slot')
+
+    def __init__(self, array, slot):
+        self.array = array
+        self.slot = slot * 2
+
+    @property
+    def items(self):
+        return self.array[self.slot]
+
+    @items.setter
+    def items(self, value):
+        self.array[self.slot] = value
+
+    @property
+    def bytes(self):
+        return self.array[self.slot + 1]
+
+    @bytes.setter
+    def bytes(self, value):
+        self.array[self.slot + 1] = value
+
+
+worker_counter = None       # SharedCounter of this pool worker, set by init_worker()
+
+
+def init_worker(array, next_slot):
+    """ Process pool initializer - gives the worker its own slot, so workers never write the same counters """
+    global worker_counter
+    with next_slot.get_lock():
+        slot = next_slot.value
+        next_slot.value += 1
+    worker_counter = SharedCounter(array, slot % (len(array) // 2))     # replaced workers reuse slots
+
+
+def human(value):
+    """ 1234567 -> '1.2M' """
+    for prefix in ('', 'K', 'M', 'G', 'T'):
+        if abs(value) < 1000 or prefix == 'T':
+            break
+        value /= 1000.0
+    return '%.1f%s' % (value, prefix) if prefix else '%d' % value
+
+
+class Progress(Counter):
+    """
+    Throughput reporter of a hot loop. The loop bumps plain counters - progress.items += 1, progress.bytes += n -
+    and a ticker thread renders lines/sec, bytes/sec, percent done and ETA every `delay` seconds
+    (to stderr, in place; if stderr isn't a terminal - just the final line).
+
+    Threads other than the one that owns `progress` bump their own progress.counter().
+    Process pool workers (up to `processes`) bump spinner.worker_counter - a slot in shared memory,
+    when the pool is created with **progress.pool_args(); there's no IPC per item.
+    """
+
+    __slots__ = ('message', 'unit', 'total_items', 'total_bytes', 'delay', 'stream', 'counters', 'shared',
+                 'next_slot', 'started', 'stopped', 'thread')
+
+    def __init__(self, message='', unit='lines', total_items=None, total_bytes=None, delay=1.0, processes=0,
+                 stream=None):
+        Counter.__init__(self)
+        self.message = message
+        self.unit = unit
+        self.total_items = total_items
+        self.total_bytes = total_bytes
+        self.delay = delay
+        self.stream = stream or sys.stderr
+        self.counters = []
+        self.shared = self.next_slot = None
+        if processes:
+            import multiprocessing
+            self.shared = multiprocessing.RawArray('q', processes * 2)      # lock-free, one writer per slot
+            self.next_slot = multiprocessing.Value('i', 0)
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def counter(self):
+        """ A Counter for another thread of the loop """
+        counter = Counter()
+        self.counters.append(counter)
+        return counter
+
+    def pool_args(self):
+        """ initializer and initargs keyword arguments of multiprocessing.Pool or ProcessPoolExecutor """
+        return dict(initializer=init_worker, initargs=(self.shared, self.next_slot))
+
+    def totals(self):
+        """ (items, bytes) counted so far by all threads and workers """
+        items = self.items + sum(c.items for c in self.counters)
+        nbytes = self.bytes + sum(c.bytes for c in self.counters)
+        if self.shared is not None:
+            items += sum(self.shared[0::2])
+            nbytes += sum(self.shared[1::2])
+        return items, nbytes
+
+    def render(self, items, nbytes, elapsed, items_rate, bytes_rate):
+        line = '%s%s %s  %s %s/s' % (self.message and self.message + ' ', human(items), self.unit,
+                                     human(items_rate), self.unit)
+        if nbytes:
+            line += '  %sB  %sB/s' % (human(nbytes), human(bytes_rate))
+
+        (done, total) = (nbytes, self.total_bytes) if self.total_bytes else (items, self.total_items)
+        if total:
+            line += '  %3.0f%%' % (100.0 * done / total)
+            if 0 < done < total:
+                eta = int(elapsed * (total - done) / done)      # by the average rate, the steadiest estimate
+                line += '  ETA %d:%02d:%02d' % (eta // 3600, eta // 60 % 60, eta % 60)
+        return line + '  in %.1fs' % elapsed
+
+    def ticker_task(self):
+        tty = self.stream.isatty()
+        (last_at, last_items, last_bytes) = (self.started, 0, 0)
+        while not self.stopped.wait(self.delay):
+            if not tty:
+                continue
+            now = time.time()
+            (items, nbytes) = self.totals()
+            interval = max(now - last_at, 1e-9)
+            self.stream.write('\r' + self.render(items, nbytes, now - self.started, (items - last_items) / interval,
+                                                 (nbytes - last_bytes) / interval) + '\033[K')
+            self.stream.flush()
+            (last_at, last_items, last_bytes) = (now, items, nbytes)
+
+    def __enter__(self):
+        self.started = time.time()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.ticker_task, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_traceback):
+        self.stopped.set()          # the ticker wakes up right away, no waiting for `delay`
+        self.thread.join()
+        elapsed = max(time.time() - self.started, 1e-9)
+        (items, nbytes) = self.totals()
+        self.stream.write(('\r' if self.stream.isatty() else '')
+                          + self.render(items, nbytes, elapsed, items / elapsed, nbytes / elapsed)
+                          + ('\033[K\n' if self.stream.isatty() else '\n'))
+        self.stream.flush()
+
+
 ### usage example: 
 #
 # with Spinner("just waiting a bit.. "):
 #
 #        time.sleep(3)
+#
+# with Progress("Parsing", total_bytes=os.path.getsize(filename)) as progress:
+#     for line in f:
+#         progress.items += 1
+#         progress.bytes += len(line)
+#
+# process pool workers count in shared memory:
+#
+# with Progress("Parsing", processes=8) as progress:
+#     with ProcessPoolExecutor(8, **progress.pool_args()) as pool:
+#         ...     # a worker does spinner.worker_counter.items += n
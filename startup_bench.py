@@ -0,0 +1,109 @@
+#!python
+
+# Startup time budget of znote.py and keytab.py
+#
+# Usage:
+#   python ./startup_bench.py [--runs=20] [--budget-scale=1.0]
+#
+# Measures median wall time of importing the modules (the in-process API path) and of running
+# their CLIs, each over a bare interpreter start, in fresh processes; exits with 1 if any is over budget.
+# Also reports in-process throughput of znote.extract_note() on a sample note.
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+from time import perf_counter
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# milliseconds over a bare `python -c pass`
+budgets = {
+    "import znote": 30,
+    "import keytab": 15,
+    "znote.py extract": 60,
+    "znote.py --help": 50,
+    "keytab.py --help": 30,     # was ~40 ms with pexpect imported at startup
+}
+
+
+def sample_note(notebooks_dir: str, noteid: str = "2BENCH001", paragraphs: int = 20):
+    os.makedirs(os.path.join(notebooks_dir, noteid))
+    texts = ["%pyspark\ndf = sqlc.table('db.t')\ndf.show()", "%sql\nselect * from db.t", "%md\n## Notes\ntext",
+             "x = 1\ny = x + 1", "z.show(df)"]
+    note = {"id": noteid, "name": "startup bench", "paragraphs": [
+        {"id": f"p{i}", "title": f"Step {i}", "config": {"enabled": True}, "text": texts[i % len(texts)],
+         "results": {"code": "SUCCESS", "msg": [{"type": "TEXT", "data": "x" * 1000}]}}
+        for i in range(paragraphs)]}
+    with open(os.path.join(notebooks_dir, noteid, "note.json"), "w") as f:
+        json.dump(note, f, indent=2)
+    return noteid
+
+
+def median_ms(command, runs: int, env):
+    times = []
+    for _ in range(runs):
+        started = perf_counter()
+        subprocess.run(command, env=env, cwd=here, stdout=subprocess.DEVNULL, check=True)
+        times.append((perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def bench_startup(runs: int, budget_scale: float, notebooks_dir: str, noteid: str):
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)     # measure with cached bytecode, as installed scripts run
+    python = sys.executable
+
+    commands = {
+        "import znote": [python, "-c", "import znote"],
+        "import keytab": [python, "-c", "import keytab"],
+        "znote.py extract": [python, "znote.py", "extract", f"--notebooks-dir={notebooks_dir}", noteid],
+        "znote.py --help": [python, "znote.py", "--help"],
+        "keytab.py --help": [python, "keytab.py", "--help"],
+    }
+
+    for command in commands.values():       # warm up page cache, write .pyc files
+        subprocess.run(command, env=env, cwd=here, stdout=subprocess.DEVNULL, check=True)
+
+    baseline = median_ms([python, "-c", "pass"], runs, env)
+    print(f"{'python -c pass':<24} {baseline:>8.1f} ms")
+
+    over_budget = []
+    for (label, command) in commands.items():
+        elapsed = median_ms(command, runs, env) - baseline
+        budget = budgets[label] * budget_scale
+        status = "ok" if elapsed <= budget else "OVER BUDGET"
+        print(f"{label:<24} {elapsed:>+8.1f} ms   budget {budget:>5.0f} ms   {status}")
+        if elapsed > budget:
+            over_budget.append(label)
+    return over_budget
+
+
+def bench_in_process(notebooks_dir: str, noteid: str, calls: int = 500):
+    sys.path.insert(0, here)
+    import znote
+
+    started = perf_counter()
+    for _ in range(calls):
+        znote.extract_note(noteid, notebooks_dir, skip_noop=True)
+    elapsed = perf_counter() - started
+    print(f"{'znote.extract_note':<24} {elapsed / calls * 1000:>8.2f} ms/call in-process")
+
+
+if __name__ == '__main__':
+    args_parser = argparse.ArgumentParser(description="Startup time budget of znote.py and keytab.py")
+    args_parser.add_argument("--runs", type=int, default=20, help="runs of every command, median is reported")
+    args_parser.add_argument("--budget-scale", type=float, default=1.0,
+                             help="multiplier of budgets, e.g. 2 for slow machines")
+    args = args_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as notebooks_dir:
+        noteid = sample_note(notebooks_dir)
+        over_budget = bench_startup(args.runs, args.budget_scale, notebooks_dir, noteid)
+        bench_in_process(notebooks_dir, noteid)
+
+    if over_budget:
+        sys.exit("Over budget: " + ", ".join(over_budget))
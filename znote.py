@@ -1,5 +1,6 @@
 #!python
 
+from __future__ import print_function
 from getpass import getuser
 
 default_notebooks_dir = '/home/%s/zeppelin/notebooks' % getuser()
@@ -11,16 +12,31 @@ Usage:
                 [--skip-select] [--skip-noop] [--no-comments] [--get-disabled]
                 [--default-interpreter=interpreter] [--sqlc-var=sqlc] [--imports] <noteid>
     znote.py clean-output [--notebooks-dir=directory] <noteid>
+    znote.py batch (extract | clean-output) [--notebooks-dir=directory] [--output-dir=directory]
+                [--processes=N] [--cache-file=file] [--force]
+                [--fetch=interpreter] [--skip-select] [--skip-noop] [--no-comments] [--get-disabled]
+                [--default-interpreter=interpreter] [--sqlc-var=sqlc] [--imports]
+    znote.py watch [--notebooks-dir=directory] [--output-dir=directory]
+                [--poll-interval=seconds] [--debounce=seconds]
+                [--fetch=interpreter] [--skip-select] [--skip-noop] [--no-comments] [--get-disabled]
+                [--default-interpreter=interpreter] [--sqlc-var=sqlc] [--imports]
     znote.py (-h | --help)
 
 Commands:
     extract             Extract code of type --type (defaults to Python)
     clean-output        Removes output from all paragraphs
                         (good to do before source rep commits and code reviews)
+    batch               Runs extract or clean-output for all notes in --notebooks-dir, in parallel;
+                        results go to --output-dir, notes unchanged since the last batch run are skipped
+    watch               Keeps extracted code of all notes in --output-dir in sync with the notes;
+                        a note is extracted again when it stops changing for --debounce seconds,
+                        and only its changed paragraphs are classified again
 
 Examples:
     python ./znote.py extract 2CAWV29G2
     python ./znote.py clean-output 2C9CTUGT3
+    python ./znote.py batch extract --output-dir=/tmp/notes_code --skip-noop
+    python ./znote.py watch --output-dir=/tmp/notes_code --skip-noop
 
 Arguments:
     <noteid>            Note ID - see directories under %s
@@ -43,6 +59,16 @@ Options:
                         interpreter type, this script has to know what's default [default: pyspark]
     --sqlc-var=sqlc     SQL Context variable [default: sqlc]
     --imports           Add a header to embed necessary Spark import
+    --output-dir=dir    Where batch writes results - <noteid>.py for extract,
+                        <noteid>/note.json for clean-output [default: ./znote-output]
+    --processes=N       Number of batch worker processes, 0 means number of CPUs [default: 0]
+    --cache-file=file   Mtimes and hashes of notes processed by previous batch runs
+                        (defaults to .znote-<command>-cache.json in --output-dir)
+    --force             Batch processes all notes, even if they haven't changed
+    --poll-interval=seconds
+                        How often watch checks notes for changes [default: 2]
+    --debounce=seconds  Zeppelin saves a note on every edit - watch waits until a note
+                        hasn't changed for that long before extracting it [default: 5]
     -h --help           Show this screen
 
 Know bugs / todo-s:
@@ -59,46 +85,92 @@ History:
 ###################################################################################################
 
 
-import json
+import io
+import os
 import re
+import json
 from os.path import isdir, isfile
 
-try:
-    from docopt import docopt       # docopt isn't part of Anaconda - so checking just this pkg
-except ImportError:
-    exit('doctopt Python package not found.')
+# hashlib, shutil, multiprocessing, docopt are imported where they're used - importing znote stays cheap
+
+json_name = 'note.json'
 
+# paragraph classifiers - compiled once, not for every paragraph
 
-# Parse command-line arguments using above pattern/description block
-args = docopt(__doc__)
-## print(args)
+para_type_re = re.compile(r'^\s*%(\w+)\s+', flags=re.MULTILINE)
 
-noteid = args['<noteid>']
+blank_re = re.compile(r'^\s*$')
 
-notebooks_dir = args['--notebooks-dir']
-note_dir = notebooks_dir + '/' + noteid
-json_name = 'note.json'
-json_file = note_dir + '/' + json_name
+noop_re = re.compile(
+            r''' \A \s *                                 # any whitespace before code
+                    (  \w + \. (show|printSchema) \( \)           # SKIP dataframe.show() or printSchema
+                    |  z \. show \( . + \)                        # OR z.show( dataframe )
+                    |  print \s * \(? .+ \)?                      # or a print statement
+                    )
+                  \s * \Z                                # any whitespace before end of the code
+             '''
+            , flags=re.VERBOSE)
+
+select_re = re.compile(
+            r'''^( \s*        # optional comment block:
+                  --            # sql syntax comment - double hyphen
+                    .*  \n      # commented line up to newline is ignored
+                 | \s*  \n      # OR empty line - since commented and empty lines can interleave
+                 )*           # 0 or more commented or empty lines
+                   \s*        # ignore spaces before `select` keyword
+               (SELECT|explain) \s+     # `select` or `explain` keyword followed by whitespace
+             '''
+            , flags=re.IGNORECASE|re.VERBOSE)
+
+line_start_re = re.compile('^', flags=re.MULTILINE)
+
+
+def extract_options(args):
+    """ Options of extract_code() from docopt arguments """
+    return dict(fetch_intp=args['--fetch'],
+                default_intp=args['--default-interpreter'],
+                sqlc=args['--sqlc-var'],
+                comments=not args['--no-comments'],
+                skip_select=args['--skip-select'],
+                skip_noop=args['--skip-noop'],
+                get_disabled=args['--get-disabled'],
+                imports=args['--imports'])
+
+
+def note_json_file(notebooks_dir, noteid):
+    """ Path of note.json of the note; IOError with a message if it's not where expected """
 
-if not isdir(notebooks_dir):    exit("Directory specified in --notebooks-dir doesn't exist (%s)" % notebooks_dir)
-if not isdir(note_dir):         exit("Note directory doesn't exist (%s). Check if NoteID is correct" % note_dir)
-if not isfile(json_file):       exit("%s file doesn't exist where expected: %s" % (json_name, json_file))
+    note_dir = notebooks_dir + '/' + noteid
+    json_file = note_dir + '/' + json_name
 
-with open(json_file) as data_file:
-    data = json.load(data_file)
+    if not isdir(notebooks_dir):    raise IOError("Directory specified in --notebooks-dir doesn't exist (%s)" % notebooks_dir)
+    if not isdir(note_dir):         raise IOError("Note directory doesn't exist (%s). Check if NoteID is correct" % note_dir)
+    if not isfile(json_file):       raise IOError("%s file doesn't exist where expected: %s" % (json_name, json_file))
 
-assert data['id'] == noteid, "Unexpected note id in " + json_file
+    return json_file
 
-if args['extract']:
 
-    fetch_intp = args['--fetch']
-    default_intp = args['--default-interpreter']
-    sqlc = args['--sqlc-var']
-    comments = not args['--no-comments']
+def load_note(json_file, noteid):
+    with io.open(json_file, encoding='utf-8') as data_file:
+        data = json.load(data_file)
 
-    if args['--imports']:
+    assert data['id'] == noteid, "Unexpected note id in " + json_file
+    return data
+
+
+def extract_code(data, imports=False, paragraph_cache=None, fetch_intp='pyspark', **options):
+    """
+    Code of the note (parsed note.json) as a list of lines.
+    paragraph_cache - {paragraph_key(): lines} from a previous call for the same note and options,
+                      only paragraphs that aren't in it are extracted; left with entries of this note only
+    """
+
+    out = []
+    emit = out.append
+
+    if imports:
             from textwrap import dedent
-            print(dedent('''
+            emit(dedent('''
                     from pyspark.sql import HiveContext
                     from pyspark import SparkConf, SparkContext
 
@@ -114,102 +186,550 @@ if args['extract']:
 
             ''' %  data['name']))
 
-    print "## Fetching %s code from Zeppelin note '%s', id %s" % (fetch_intp, data['name'], noteid)
+    emit("## Fetching %s code from Zeppelin note '%s', id %s" % (fetch_intp, data['name'], data['id']))
 
+    used = {}
     for p in data['paragraphs']:
 
-        print
+        emit('')
 
-        if comments:
-            print '## Paragraph %s:' % p['id']
+        if paragraph_cache is None:
+            out.extend(extract_paragraph(p, fetch_intp, **options))
+            continue
 
-        # Check if paragraph is disabled
-        enabled = p['config'].get('enabled', True)      # by default assume enabled
-        if not enabled:
-            if args['--get-disabled']:
-                if comments: print "## paragraph '%s' is disabled but will run because of --get-disabled" % p['id']
-            else:
-                if comments: print "## paragraph '%s' is disabled and will be skipped" % p['id']
-                continue
+        key = paragraph_key(p)
+        lines = paragraph_cache.get(key)
+        if lines is None:
+            lines = extract_paragraph(p, fetch_intp, **options)
+        used[key] = lines
+        out.extend(lines)
+
+    if paragraph_cache is not None:
+        paragraph_cache.clear()
+        paragraph_cache.update(used)
+
+    return out
+
+
+def paragraph_key(p):
+    """ Hash of everything extract_paragraph() looks at """
+    import hashlib
+    return hashlib.sha1(json.dumps([p.get('id'), p.get('title'), p.get('text'), p['config'].get('enabled', True)]
+                                   ).encode('utf-8')).hexdigest()
 
-        # print title
-        title = p.get('title', '')
-        if title and comments:
-            print "## **** %s ****" % title
 
-        text = p.get('text', '')                        # empty text '' is the default
+def extract_paragraph(p, fetch_intp='pyspark', default_intp='pyspark', sqlc='sqlc', comments=True,
+                      skip_select=False, skip_noop=False, get_disabled=False):
+    """ Code of one paragraph as a list of lines """
 
-        # Zeppelin thing - 'scala' is default irrespective of default interpreter setting
-        # para_type = p['config'].get('editorMode', 'ace/mode/scala').split('/')[2]       # takes last word
-        # So editorMode is misleading and below code will infer type from the text instead..
+    out = []
+    emit = out.append
 
-        # Detect paragraph type
-        para_type_re = '^\s*%(\w+)\s+'
-        m = re.match(para_type_re, text, flags=re.MULTILINE)
-        if m:
-            para_type = m.group(1)
-            text = re.sub(para_type_re, '', text, count=1, flags=re.MULTILINE)      # remove para type from the code too
+    if comments:
+        emit('## Paragraph %s:' % p['id'])
+
+    # Check if paragraph is disabled
+    enabled = p['config'].get('enabled', True)      # by default assume enabled
+    if not enabled:
+        if get_disabled:
+            if comments: emit("## paragraph '%s' is disabled but will run because of --get-disabled" % p['id'])
         else:
-            para_type = default_intp
+            if comments: emit("## paragraph '%s' is disabled and will be skipped" % p['id'])
+            return out
 
-        # if comments: print "## (paragraph type is %s)" % para_type
+    # print title
+    title = p.get('title', '')
+    if title and comments:
+        emit("## **** %s ****" % title)
 
-        if re.match('^\s*$', text):
-            if comments: print "## (no code)"
-            continue
+    text = p.get('text', '')                        # empty text '' is the default
 
-        # Now we can append code of the current paragraph
-        if para_type == fetch_intp:
-
-            # first, check if it's a no-op command that we should skip
-            if args['--skip-noop'] and fetch_intp=='pyspark' and re.match(
-                        r''' \A \s *                                 # any whitespace before code
-                                (  \w + \. (show|printSchema) \( \)           # SKIP dataframe.show() or printSchema
-                                |  z \. show \( . + \)                        # OR z.show( dataframe )
-                                |  print \s * \(? .+ \)?                      # or a print statement
-                                )
-                              \s * \Z                                # any whitespace before end of the code
-                         '''
-                        , text
-                        , flags=re.VERBOSE
-                        ):
-                    if comments: print("## skipping no-op code because of --skip-noop")
-                    continue  # skip to next paragraph
-
-            print text
-
-        elif para_type == 'sql':
-
-            # first, check if it's a pure select statement that we should skip
-            if args['--skip-select'] and re.match(
-                        r'''^( \s*        # optional comment block:
-                              --            # sql syntax comment - double hyphen
-                                .*  \n      # commented line up to newline is ignored
-                             | \s*  \n      # OR empty line - since commented and empty lines can interleave
-                             )*           # 0 or more commented or empty lines
-                               \s*        # ignore spaces before `select` keyword
-                           (SELECT|explain) \s+     # `select` or `explain` keyword followed by whitespace
-                         '''
-                        , text
-                        , flags=re.IGNORECASE|re.VERBOSE
-                        ):
-                if comments: print("## skipping SELECT/explain statement because of --skip-select")
-                continue  # skip to next paragraph
-
-            print "%s.sql(''' %s ''')" % (sqlc, text)
-
-        elif para_type == 'md':
-
-            text = re.sub('^', '# ', text, flags=re.MULTILINE)      # show MarkDown as-is, just commented
-            print text
-
-        elif para_type == 'sh':
-
-            # TODO: 
+    # Zeppelin thing - 'scala' is default irrespective of default interpreter setting
+    # para_type = p['config'].get('editorMode', 'ace/mode/scala').split('/')[2]       # takes last word
+    # So editorMode is misleading and below code will infer type from the text instead..
 
-            continue
+    # Detect paragraph type
+    m = para_type_re.match(text)
+    if m:
+        para_type = m.group(1)
+        text = para_type_re.sub('', text, count=1)      # remove para type from the code too
+    else:
+        para_type = default_intp
+
+    # if comments: emit("## (paragraph type is %s)" % para_type)
+
+    if blank_re.match(text):
+        if comments: emit("## (no code)")
+        return out
+
+    # Now we can append code of the current paragraph
+    if para_type == fetch_intp:
+
+        # first, check if it's a no-op command that we should skip
+        if skip_noop and fetch_intp=='pyspark' and noop_re.match(text):
+                if comments: emit("## skipping no-op code because of --skip-noop")
+                return out  # skip to next paragraph
+
+        emit(text)
+
+    elif para_type == 'sql':
+
+        # first, check if it's a pure select statement that we should skip
+        if skip_select and select_re.match(text):
+            if comments: emit("## skipping SELECT/explain statement because of --skip-select")
+            return out  # skip to next paragraph
+
+        emit("%s.sql(''' %s ''')" % (sqlc, text))
+
+    elif para_type == 'md':
+
+        text = line_start_re.sub('# ', text)      # show MarkDown as-is, just commented
+        emit(text)
+
+    elif para_type == 'sh':
+
+        # TODO:
+
+        return out
+
+    else:
+        if comments: emit("## skipping non-target language '%s'" % para_type)
+
+    return out
+
+
+class OutputFilter:
+    """
+    Copies note.json without output of paragraphs (`result` of Zeppelin 0.6, `results` of 0.7+),
+    keeping the rest of JSON byte for byte.
+
+    Works on a stream - only a chunk of input and one object key are kept in memory,
+    so outputs of any size are skipped in bounded memory.
+    """
+
+    chunk_size = 1 << 16      # also bounds memory of regex matching strings with many escapes
+    output_keys = (b'"result"', b'"results"')
 
+    ws_re = re.compile(br'[ \t\r\n]*')
+    string_re = re.compile(br'[^"\\]*(?:\\.[^"\\]*)*', flags=re.DOTALL)     # up to end of string
+    nested_re = re.compile(br'[^"{}\[\]]*')          # up to a string or a bracket
+    literal_re = re.compile(br'[^,}\] \t\r\n]*')      # number, true, false, null
+    rest_re = re.compile(br'.*', flags=re.DOTALL)
+
+    def __init__(self, in_file, out_file):
+        self.f = in_file
+        self.buf = b''
+        self.pos = 0
+        self.write = out_file.write
+
+    def run(self):
+        write = self.write
+        write(self.ws())
+        self.object(self.note_key, write)
+        self.span(self.rest_re, write)
+
+    # handlers of object members - return function that processes value, None to copy it, or 'skip'
+
+    def note_key(self, key):
+        if key == b'"paragraphs"':
+            return lambda write: self.array(self.paragraph, write)
+
+    def paragraph_key(self, key):
+        if key in self.output_keys:
+            return 'skip'
+
+    def paragraph(self, write):
+        if self.peek() == b'{':
+            self.object(self.paragraph_key, write)
+        else:
+            self.value(write)
+
+    # input buffer
+
+    def more(self):
+        """ Appends next chunk of input to the not consumed part of buffer; False at end of file """
+        chunk = self.f.read(self.chunk_size)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return bool(chunk)
+
+    def peek(self):
+        if self.pos >= len(self.buf) and not self.more():
+            raise ValueError("Unexpected end of JSON")
+        return self.buf[self.pos:self.pos + 1]
+
+    def char(self):
+        c = self.peek()
+        self.pos += 1
+        return c
+
+    def span(self, pattern, write):
+        """ Consumes bytes matching pattern (which can span many chunks), writes them unless write is None """
+        while True:
+            end = pattern.match(self.buf, self.pos).end()
+            if write:
+                write(self.buf[self.pos:end])
+            self.pos = end
+            if end < len(self.buf) or not self.more():
+                return
+
+    def ws(self):
+        out = []
+        self.span(self.ws_re, out.append)
+        return b''.join(out)
+
+    # JSON values
+
+    def string(self, write):
+        write(self.char())
+        while True:
+            self.span(self.string_re, write)
+            c = self.char()
+            write(c)
+            if c == b'"':
+                return
+            write(self.char())      # escaped character
+
+    def value(self, write):
+        """ Copies (or skips, with write=None) a value without looking into it """
+        write = write or (lambda data: None)
+        c = self.peek()
+        if c == b'"':
+            self.string(write)
+        elif c in (b'{', b'['):
+            depth = 0
+            while True:
+                self.span(self.nested_re, write)
+                if self.peek() == b'"':
+                    self.string(write)
+                    continue
+                c = self.char()
+                write(c)
+                depth += 1 if c in (b'{', b'[') else -1
+                if not depth:
+                    return
+        else:
+            self.span(self.literal_re, write)
+
+    def object(self, handler, write):
+        """ Copies object, members are processed as handler(key) says; commas of skipped members are dropped """
+        if self.char() != b'{':
+            raise ValueError("JSON object expected")
+        write(b'{')
+        first = True
+        while True:
+            ws = self.ws()
+            if self.peek() == b'}':
+                write(ws + self.char())
+                return
+            key = []
+            self.string(key.append)
+            key = b''.join(key)
+            ws_key = self.ws()
+            if self.char() != b':':
+                raise ValueError("':' expected after key %s" % key)
+            ws_value = self.ws()
+
+            action = handler(key)
+            if action == 'skip':
+                self.value(None)
+            else:
+                write((b',' if not first else b'') + ws + key + ws_key + b':' + ws_value)
+                (action or self.value)(write)
+                first = False
+
+            ws = self.ws()
+            c = self.char()
+            if c == b'}':
+                write(ws + c)
+                return
+            if c != b',':
+                raise ValueError("',' or '}' expected after value of %s" % key)
+
+    def array(self, element, write):
+        if self.char() != b'[':
+            raise ValueError("JSON array expected")
+        write(b'[')
+        while True:
+            ws = self.ws()
+            if self.peek() == b']':
+                write(ws + self.char())
+                return
+            write(ws)
+            element(write)
+            ws = self.ws()
+            c = self.char()
+            write(ws + c)
+            if c == b']':
+                return
+            if c != b',':
+                raise ValueError("',' or ']' expected in array")
+
+
+def clean_output(json_file, output_file=None):
+    """
+    Removes output of all paragraphs from note.json - in place, or into output_file.
+    Result is written to a temp file that atomically replaces the target.
+    """
+
+    output_file = output_file or json_file
+    tmp_file = output_file + '.tmp'
+    try:
+        with open(json_file, 'rb') as in_file:
+            with io.open(tmp_file, 'wb') as out_file:
+                OutputFilter(in_file, out_file).run()
+                out_file.flush()
+                os.fsync(out_file.fileno())
+        if isfile(output_file):
+            import shutil
+            shutil.copymode(output_file, tmp_file)
+        os.rename(tmp_file, output_file)
+    except BaseException:
+        if isfile(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def extract_note(noteid, notebooks_dir=default_notebooks_dir, **options):
+    """
+    Code of the note as text - what `znote.py extract` prints.
+    options are keyword arguments of extract_code() / extract_paragraph(), e.g. skip_noop=True
+    """
+    data = load_note(note_json_file(notebooks_dir, noteid), noteid)
+    return '\n'.join(extract_code(data, **options))
+
+
+def clean_note(noteid, notebooks_dir=default_notebooks_dir, output_file=None):
+    """ Removes output of all paragraphs of the note - what `znote.py clean-output` does """
+    clean_output(note_json_file(notebooks_dir, noteid), output_file)
+
+
+def write_file(path, text):
+    """ Writes through a temp file, so readers never see a partial file """
+    if isinstance(text, bytes):     # json.dumps() of Python 2
+        text = text.decode('utf-8')
+    with io.open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.rename(path + '.tmp', path)
+
+
+###################################################################################################
+# batch processing of all notes
+
+
+def note_signature(command, options):
+    """ Cached results are only valid for the same command and extract options """
+    import hashlib
+    return hashlib.sha1(json.dumps([command, options], sort_keys=True).encode()).hexdigest()
+
+
+def batch_task(task):
+    """
+    Worker - processes one note unless its note.json is unchanged since the cached run
+    (same mtime and size, or same content hash); returns (noteid, new cache entry, status)
+    """
+
+    import hashlib
+
+    (command, notebooks_dir, noteid, output_dir, options, signature, cached) = task
+    json_file = notebooks_dir + '/' + noteid + '/' + json_name
+
+    try:
+        st = os.stat(json_file)
+        entry = dict(mtime=st.st_mtime, size=st.st_size, signature=signature)
+        if cached and cached.get('signature') == signature and \
+                (cached['mtime'], cached['size']) == (st.st_mtime, st.st_size):
+            return noteid, cached, 'unchanged'
+
+        sha1 = hashlib.sha1()
+        with open(json_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(chunk)
+        entry['sha1'] = sha1.hexdigest()
+        if cached and cached.get('signature') == signature and cached.get('sha1') == entry['sha1']:
+            return noteid, entry, 'unchanged'       # touched, but not changed
+
+        if command == 'extract':
+            data = load_note(json_file, noteid)
+            write_file(output_dir + '/' + noteid + '.py', '\n'.join(extract_code(data, **options)) + '\n')
         else:
-            if comments: print("## skipping non-target language '%s'" % para_type)
+            note_output_dir = output_dir + '/' + noteid
+            if not isdir(note_output_dir):
+                os.makedirs(note_output_dir)
+            clean_output(json_file, note_output_dir + '/' + json_name)
+        return noteid, entry, 'done'
+
+    except Exception as e:
+        return noteid, None, 'failed: %s' % e
+
+
+def load_cache(cache_file):
+    try:
+        with io.open(cache_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def batch(command, notebooks_dir, output_dir, processes=0, cache_file=None, force=False, options=None):
+    """ Runs extract or clean-output for every note of notebooks_dir in a process pool """
+
+    from multiprocessing import Pool
+
+    if not isdir(notebooks_dir):
+        raise IOError("Directory specified in --notebooks-dir doesn't exist (%s)" % notebooks_dir)
+    if not isdir(output_dir):
+        os.makedirs(output_dir)
+
+    cache_file = cache_file or '%s/.znote-%s-cache.json' % (output_dir, command)
+    cache = {} if force else load_cache(cache_file)
+    options = options or {}
+    signature = note_signature(command, options)
+
+    noteids = sorted(noteid for noteid in os.listdir(notebooks_dir)
+                     if isfile(notebooks_dir + '/' + noteid + '/' + json_name))
+    tasks = [(command, notebooks_dir, noteid, output_dir, options, signature, cache.get(noteid))
+             for noteid in noteids]
+
+    counts = {}
+    pool = Pool(processes or None)
+    try:
+        for (noteid, entry, status) in pool.imap_unordered(batch_task, tasks, chunksize=16):
+            if entry:
+                cache[noteid] = entry
+            else:
+                cache.pop(noteid, None)
+                print("%s: %s" % (noteid, status))
+            status = status.split(':')[0]
+            counts[status] = counts.get(status, 0) + 1
+    finally:
+        pool.close()
+        pool.join()
+
+    # notes that were removed from notebooks_dir
+    for noteid in set(cache) - set(noteids):
+        del cache[noteid]
+    write_file(cache_file, json.dumps(cache, indent=1, sort_keys=True))
+
+    print("%d notes: %d processed, %d unchanged, %d failed" % (
+            len(noteids), counts.get('done', 0), counts.get('unchanged', 0), counts.get('failed', 0)))
+    return counts.get('failed', 0) == 0
+
+
+###################################################################################################
+# watch mode
+
+
+def watch_extract(json_file, noteid, output_file, paragraph_cache, options):
+    before = set(paragraph_cache)
+    try:
+        data = load_note(json_file, noteid)
+    except (ValueError, AssertionError, IOError, OSError) as e:
+        print("%s: failed: %s" % (noteid, e))
+        return
+
+    lines = extract_code(data, paragraph_cache=paragraph_cache, **options)
+    write_file(output_file, '\n'.join(lines) + '\n')
+    print("%s: extracted, %d of %d paragraphs changed" % (
+            noteid, len(set(paragraph_cache) - before), len(data['paragraphs'])))
+
+
+def watch(notebooks_dir, output_dir, options=None, poll_interval=2, debounce=5, stop=None):
+    """
+    Polls note.json files of notebooks_dir and keeps <noteid>.py in output_dir in sync with them.
+    A changed note is extracted once its mtime and size stay the same for `debounce` seconds;
+    extracted code of every paragraph is cached by paragraph_key(), so only changed paragraphs are processed.
+    Runs until `stop` (threading.Event) is set.
+    """
+
+    import time
+    import threading
+
+    stop = stop or threading.Event()
+    options = options or {}
+    if not isdir(notebooks_dir):
+        raise IOError("Directory specified in --notebooks-dir doesn't exist (%s)" % notebooks_dir)
+    if not isdir(output_dir):
+        os.makedirs(output_dir)
+
+    notes = {}      # noteid -> {seen: (mtime, size), changed_at, synced: (mtime, size) when extracted, paragraphs}
+    first_scan = True
+
+    while True:
+        now = time.time()
+        current = set()
+
+        for noteid in os.listdir(notebooks_dir):
+            json_file = notebooks_dir + '/' + noteid + '/' + json_name
+            output_file = output_dir + '/' + noteid + '.py'
+            try:
+                st = os.stat(json_file)
+            except OSError:
+                continue
+            current.add(noteid)
+            signature = (st.st_mtime, st.st_size)
+
+            note = notes.get(noteid)
+            if note is None:
+                # code extracted after the last change of the note is in sync
+                synced = signature if isfile(output_file) and os.stat(output_file).st_mtime >= st.st_mtime else None
+                note = notes[noteid] = dict(seen=signature, changed_at=0 if first_scan else now,
+                                            synced=synced, paragraphs={})
+            elif signature != note['seen']:
+                note['seen'] = signature
+                note['changed_at'] = now
+
+            if note['seen'] != note['synced'] and now - note['changed_at'] >= debounce:
+                note['synced'] = note['seen']
+                watch_extract(json_file, noteid, output_file, note['paragraphs'], options)
+
+        for noteid in set(notes) - current:
+            del notes[noteid]
+            print("%s: removed" % noteid)
+
+        first_scan = False
+        if stop.wait(poll_interval):
+            return
+
+
+def main(args):
+
+    notebooks_dir = args['--notebooks-dir']
+
+    if args['batch']:
+        command = 'extract' if args['extract'] else 'clean-output'
+        ok = batch(command, notebooks_dir, args['--output-dir'], int(args['--processes']),
+                   args['--cache-file'], args['--force'],
+                   extract_options(args) if command == 'extract' else None)
+        return 0 if ok else 1
+
+    if args['watch']:
+        try:
+            watch(notebooks_dir, args['--output-dir'], extract_options(args),
+                  float(args['--poll-interval']), float(args['--debounce']))
+        except KeyboardInterrupt:
+            pass
+
+    elif args['extract']:
+        print(extract_note(args['<noteid>'], notebooks_dir, **extract_options(args)))
+
+    elif args['clean-output']:
+        clean_note(args['<noteid>'], notebooks_dir)
+
+    return 0
+
+
+if __name__ == '__main__':
+
+    import sys
+
+    try:
+        from docopt import docopt       # docopt isn't part of Anaconda - so checking just this pkg
+    except ImportError:
+        sys.exit('doctopt Python package not found.')
 
-exit()
+    # Parse command-line arguments using above pattern/description block
+    try:
+        sys.exit(main(docopt(__doc__)))
+    except IOError as e:
+        sys.exit(str(e))